@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Todo
+from .search import filter_matching
 
 # Register your models here.
 
@@ -10,3 +11,9 @@ class TodoAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     readonly_fields = ('created_at', 'updated_at')
     list_editable = ('completed',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search title and description through the FTS5 index instead of LIKE scans"""
+        if not search_term.strip():
+            return queryset, False
+        return filter_matching(queryset, search_term), False
@@ -0,0 +1,200 @@
+"""
+JSON API for todos, next to the HTML views.
+
+    GET   /api/todos/           one page of todos, newest first
+                                (?after=<cursor>, ?page_size=, ?status=, ?fields=)
+    POST  /api/todos/           create a list of todos with bulk_create()
+    PATCH /api/todos/           update a list of todos (each with its id) with bulk_update()
+    GET   /api/todos/<id>/      one todo (?fields=)
+
+fields is a comma-separated list of the fields to return (the id is always
+returned). Errors are {"error": "..."} with a 4xx status.
+
+The views are csrf_exempt, for programmatic clients. Writes must be sent as
+Content-Type: application/json, which a cross-site form cannot send (browsers
+only allow it after a CORS preflight); anything else gets a 415.
+"""
+
+import json
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .models import Todo
+from .views import STATUS_FILTERS, decode_cursor, encode_cursor, older_than, parse_page_size
+
+FIELDS = ('title', 'description', 'completed', 'created_at', 'updated_at')
+WRITABLE_FIELDS = ('title', 'description', 'completed')
+MAX_BATCH = 1000
+
+
+class ApiError(Exception):
+    """A client error, returned as {"error": message} with status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(error):
+    return JsonResponse({'error': str(error)}, status=error.status)
+
+
+def parse_fields(request):
+    """The fields asked for with ?fields=, in FIELDS order (all of them by default)"""
+    value = request.GET.get('fields')
+    if not value:
+        return FIELDS
+    names = {name.strip() for name in value.split(',') if name.strip()} - {'id'}
+    unknown = names - set(FIELDS)
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in FIELDS if name in names)
+
+
+def serialize(values, fields):
+    """A todo's field values (a dict with 'id' and fields) as JSON-ready data"""
+    data = {'id': values['id']}
+    for name in fields:
+        value = values[name]
+        data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
+
+
+def parse_batch(request):
+    """The JSON list of objects in the request body (which must be sent as application/json)"""
+    if request.content_type != 'application/json':
+        raise ApiError("Content-Type must be application/json", status=415)
+    try:
+        items = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ApiError(f"Invalid JSON: {e}") from None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ApiError("Expected a JSON list of objects")
+    if len(items) > MAX_BATCH:
+        raise ApiError(f"At most {MAX_BATCH} todos per request")
+    return items
+
+
+def clean(item, index, required=(), keys=WRITABLE_FIELDS):
+    """The writable fields of item, validated (any key not in keys is rejected); raises ApiError naming the item at index"""
+    unknown = set(item) - set(keys)
+    if unknown:
+        raise ApiError(f"Item {index}: unknown or read-only field(s): {', '.join(sorted(unknown))}")
+    for name in required:
+        if name not in item:
+            raise ApiError(f"Item {index}: {name} is required")
+
+    cleaned = {}
+    if 'title' in item:
+        title = item['title']
+        max_length = Todo._meta.get_field('title').max_length
+        if not isinstance(title, str) or not title.strip() or len(title) > max_length:
+            raise ApiError(f"Item {index}: title must be a non-empty string of at most {max_length} characters")
+        cleaned['title'] = title
+    if 'description' in item:
+        if not isinstance(item['description'], str):
+            raise ApiError(f"Item {index}: description must be a string")
+        cleaned['description'] = item['description']
+    if 'completed' in item:
+        if not isinstance(item['completed'], bool):
+            raise ApiError(f"Item {index}: completed must be true or false")
+        cleaned['completed'] = item['completed']
+    return cleaned
+
+
+def list_todos(request):
+    """One page of todos, newest first, with the cursor of the next page"""
+    fields = parse_fields(request)
+    page_size = parse_page_size(request.GET.get('page_size'))
+    todos = Todo.objects.all()
+
+    status = request.GET.get('status')
+    if status:
+        if status not in STATUS_FILTERS:
+            raise ApiError(f"status must be one of {', '.join(STATUS_FILTERS)}")
+        todos = todos.filter(completed=STATUS_FILTERS[status])
+    if request.GET.get('after'):
+        after = decode_cursor(request.GET['after'])
+        if after is None:
+            raise ApiError("Invalid cursor")
+        todos = todos.filter(older_than(*after))
+
+    # Only the asked-for columns, plus what the cursor needs, and no model instances
+    columns = dict.fromkeys(('id', 'created_at', *fields))
+    rows = list(todos.order_by('-created_at', '-id').values(*columns)[:page_size + 1])
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = encode_cursor(page[-1]['created_at'], page[-1]['id'])
+    return JsonResponse({'results': [serialize(row, fields) for row in page], 'next': next_cursor})
+
+
+def create_todos(request):
+    """Create every todo in the body with bulk INSERTs; returns them with their ids"""
+    items = parse_batch(request)
+    todos = [Todo(**clean(item, i, required=('title',))) for i, item in enumerate(items)]
+    Todo.objects.bulk_create(todos)
+    values = [{'id': todo.pk, **{name: getattr(todo, name) for name in FIELDS}} for todo in todos]
+    return JsonResponse({'results': [serialize(row, FIELDS) for row in values]}, status=201)
+
+
+def update_todos(request):
+    """
+    Apply partial updates ({"id": ..., <fields to change>}) to many todos:
+    one SELECT for the todos and bulk UPDATEs for the changes.
+    """
+    items = parse_batch(request)
+    changes = {}
+    for i, item in enumerate(items):
+        pk = item.get('id')
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            raise ApiError(f"Item {i}: id must be an integer")
+        if not Todo.objects.id_in_range(pk):
+            raise ApiError(f"Item {i}: id out of range")
+        changes.setdefault(pk, {}).update(clean(item, i, keys=('id', *WRITABLE_FIELDS)))
+
+    todos = Todo.objects.in_bulk(list(changes))
+    missing = sorted(set(changes) - set(todos))
+    if missing:
+        raise ApiError(f"No todo with id(s) {', '.join(map(str, missing))}", status=404)
+
+    # bulk_update() skips auto_now, so updated_at is set here
+    now = timezone.now()
+    fields = {'updated_at'}
+    for pk, values in changes.items():
+        for name, value in values.items():
+            setattr(todos[pk], name, value)
+        todos[pk].updated_at = now
+        fields.update(values)
+    Todo.objects.bulk_update(todos.values(), sorted(fields))
+
+    values = [{'id': todo.pk, **{name: getattr(todo, name) for name in FIELDS}} for todo in todos.values()]
+    return JsonResponse({'results': [serialize(row, FIELDS) for row in values]})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST', 'PATCH'])
+def todo_collection(request):
+    """GET lists todos, POST creates todos, PATCH updates todos"""
+    handlers = {'GET': list_todos, 'POST': create_todos, 'PATCH': update_todos}
+    try:
+        return handlers[request.method](request)
+    except ApiError as e:
+        return error_response(e)
+
+
+@csrf_exempt
+@require_GET
+def todo_detail(request, pk):
+    """One todo"""
+    try:
+        fields = parse_fields(request)
+        row = Todo.objects.filter(pk=pk).values('id', *fields).first()
+        if row is None:
+            raise ApiError(f"No todo with id {pk}", status=404)
+    except ApiError as e:
+        return error_response(e)
+    return JsonResponse(serialize(row, fields))
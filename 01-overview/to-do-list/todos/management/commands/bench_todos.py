@@ -0,0 +1,137 @@
+"""
+Benchmark the todo list queries on a large, seeded table.
+
+Runs in a throwaway test database (the real one is never touched): seeds
+--rows todos, then times the list, filter and admin queries and prints
+their SQLite query plans, first with the indexes from the migrations and
+then with those indexes dropped, so the two can be compared. Full-text
+search through the FTS5 index is timed against the LIKE scans it replaces.
+"""
+
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from todos.models import Todo
+from todos.search import filter_matching, search_todos
+
+PAGE_SIZE = 20
+
+WORDS = (
+    "buy", "call", "write", "review", "fix", "plan", "book", "clean", "send", "read",
+    "milk", "report", "invoice", "meeting", "garden", "car", "dentist", "budget", "email", "slides",
+    "bug", "release", "tickets", "birthday", "groceries", "taxes", "flight", "hotel", "laundry", "blog",
+)
+# Searched for in the benchmark: a word in 1 todo in 10,000, one in about a third of
+# them (WORDS is small) and one in none
+SEARCH_TERMS = ("project4242", "invoice", "nosuchword")
+
+
+def access_paths(rows):
+    """The queries to time, as (name, queryset) pairs, for a table of rows todos"""
+    ordered = Todo.objects.order_by('-created_at', '-id')
+    deep = ordered.values_list('created_at', 'id')[rows * 9 // 10]
+    created_at, pk = deep
+    after_deep = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+    since = timezone.now() - timedelta(days=7)
+    return [
+        ("list, first page", ordered[:PAGE_SIZE + 1]),
+        ("list, page at 90% (cursor)", ordered.filter(after_deep)[:PAGE_SIZE + 1]),
+        ("list, page at 90% (OFFSET)", ordered[rows * 9 // 10:rows * 9 // 10 + PAGE_SIZE + 1]),
+        ("pending, first page", ordered.filter(completed=False)[:PAGE_SIZE + 1]),
+        ("completed, first page", ordered.filter(completed=True)[:PAGE_SIZE + 1]),
+        ("completed, page at 90% (cursor)", ordered.filter(after_deep, completed=True)[:PAGE_SIZE + 1]),
+        ("admin, last 7 days", Todo.objects.filter(created_at__gte=since).order_by('-created_at', '-pk')[:100]),
+        ("admin, count completed", Todo.objects.filter(completed=True).order_by()),
+    ]
+
+
+def seed(rows, batch_size):
+    """Insert rows todos spread over the last year, about 30% of them completed"""
+    rng = random.Random(0)
+    now = timezone.now()
+    start = now - timedelta(days=365)
+    step = (now - start) / rows
+    sql = (f"INSERT INTO {Todo._meta.db_table} (title, description, completed, created_at, updated_at) "
+           "VALUES (%s, %s, %s, %s, %s)")
+    with connection.cursor() as cursor:
+        for first in range(0, rows, batch_size):
+            batch = []
+            for i in range(first, min(first + batch_size, rows)):
+                # Round to the second so that some todos share a created_at
+                created_at = (start + step * i).replace(microsecond=0)
+                title = " ".join(rng.sample(WORDS, 3)) + f" project{i % 10_000}"
+                description = " ".join(rng.choices(WORDS, k=8))
+                batch.append((title, description, rng.random() < 0.3, created_at, created_at))
+            cursor.executemany(sql, batch)
+        cursor.execute("ANALYZE")
+
+
+def run_query(queryset):
+    """Evaluate a query: count it if it is the admin count, fetch it otherwise"""
+    if queryset.query.is_sliced:
+        return list(queryset)
+    return queryset.count()
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="todos to seed")
+        parser.add_argument("--repeat", type=int, default=20, help="runs per query (the median is reported)")
+        parser.add_argument("--batch-size", type=int, default=10_000, help="rows per INSERT batch")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            seed(rows, options['batch_size'])
+            self.stdout.write(f"Seeded {rows:,} todos in {time.perf_counter() - start:.1f} s")
+
+            self.report("With indexes", rows, options['repeat'])
+            self.report_search(options['repeat'])
+            with connection.schema_editor() as editor:
+                for index in Todo._meta.indexes:
+                    editor.remove_index(Todo, index)
+            self.report("Without indexes", rows, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def time_median(self, run, repeat):
+        """Median seconds of repeat calls of run"""
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    def report_search(self, repeat):
+        self.stdout.write("=" * 100)
+        self.stdout.write("Search, first page: FTS5 (ranked) vs LIKE (what admin search_fields did)")
+        self.stdout.write("=" * 100)
+        for term in SEARCH_TERMS:
+            like = Todo.objects.filter(Q(title__icontains=term) | Q(description__icontains=term))
+            matches = filter_matching(Todo.objects.order_by(), term).count()
+            fts = self.time_median(lambda: search_todos(term, limit=PAGE_SIZE), repeat)
+            scan = self.time_median(lambda: list(like[:PAGE_SIZE]), repeat)
+            self.stdout.write(f"{term:>20} ({matches:>7} matches): FTS5 {fts * 1000:9.3f} ms | "
+                              f"LIKE {scan * 1000:9.3f} ms")
+
+    def report(self, title, rows, repeat):
+        self.stdout.write("=" * 100)
+        self.stdout.write(title)
+        self.stdout.write("=" * 100)
+        for name, queryset in access_paths(rows):
+            seconds = self.time_median(lambda: run_query(queryset.all()), repeat)
+            plan = "; ".join(line.split(" ", 3)[-1] for line in queryset.explain().splitlines())
+            self.stdout.write(f"{name:>32}: {seconds * 1000:9.3f} ms | {plan}")
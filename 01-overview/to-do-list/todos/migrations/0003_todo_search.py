@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# An external-content FTS5 index over todos_todo(title, description): the text
+# lives only in todos_todo, and the triggers keep the index in step with every
+# INSERT, UPDATE and DELETE, whether it comes from the ORM or from raw SQL.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE todos_todo_fts USING fts5(
+        title, description,
+        content='todos_todo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER todos_todo_fts_insert AFTER INSERT ON todos_todo BEGIN
+        INSERT INTO todos_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_todo_fts_delete AFTER DELETE ON todos_todo BEGIN
+        INSERT INTO todos_todo_fts(todos_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_todo_fts_update AFTER UPDATE OF title, description ON todos_todo BEGIN
+        INSERT INTO todos_todo_fts(todos_todo_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_todo_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Index the todos that already exist
+    "INSERT INTO todos_todo_fts(todos_todo_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS todos_todo_fts_update",
+    "DROP TRIGGER IF EXISTS todos_todo_fts_delete",
+    "DROP TRIGGER IF EXISTS todos_todo_fts_insert",
+    "DROP TABLE IF EXISTS todos_todo_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0002_todo_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, reverse_sql=DROP_SQL),
+    ]
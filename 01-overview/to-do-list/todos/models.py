@@ -1,7 +1,41 @@
-from django.db import models
+from django.db import connections, models
+from django.utils import timezone
 
 # Create your models here.
 
+class TodoQuerySet(models.QuerySet):
+    def set_completed(self, completed):
+        """Mark every todo in the queryset completed (or pending) in one UPDATE; returns the row count"""
+        # update() skips auto_now, so updated_at is set here
+        return self.update(completed=completed, updated_at=timezone.now())
+
+
+class TodoManager(models.Manager.from_queryset(TodoQuerySet)):
+    def id_in_range(self, pk):
+        """Whether pk fits the id column (the database driver raises OverflowError for larger ints)"""
+        low, high = connections[self.db].ops.integer_field_range(self.model._meta.pk.get_internal_type())
+        return low <= pk <= high
+
+    def toggle(self, pk):
+        """
+        Flip the completed flag of todo pk in a single UPDATE ... RETURNING
+        statement (no read-modify-write, so concurrent toggles are never
+        lost) and return the new value, or None if there is no such todo.
+        """
+        if not self.id_in_range(pk):
+            return None
+        connection = connections[self.db]
+        table = self.model._meta.db_table
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET completed = NOT completed, updated_at = %s WHERE id = %s RETURNING completed",
+                [now, pk],
+            )
+            row = cursor.fetchone()
+        return None if row is None else bool(row[0])
+
+
 class Todo(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -9,8 +43,21 @@ class Todo(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TodoManager()
+
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The list view and its keyset pagination: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='todo_created_idx'),
+            # The completed/pending filters (list view and admin) with the same ordering.
+            # Partial rather than (completed, created_at) indexes: Django filters booleans
+            # as WHERE completed / WHERE NOT completed, which only partial indexes match.
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(completed=True),
+                         name='todo_completed_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(completed=False),
+                         name='todo_pending_idx'),
+        ]
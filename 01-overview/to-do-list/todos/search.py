@@ -0,0 +1,58 @@
+"""Full-text search over todos, backed by the todos_todo_fts FTS5 table (see migration 0003)"""
+
+import re
+
+from django.db.models.expressions import RawSQL
+
+from .models import Todo
+
+FTS_TABLE = 'todos_todo_fts'
+
+# bm25 weights of the title and description columns: a match in the title counts more
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fts_query(text):
+    """
+    An FTS5 MATCH expression for text typed in a search box, or None if it
+    has no words. Every word must match; the last one may be a prefix, so
+    results show up while a word is still being typed. Words are quoted,
+    so FTS5 operators and punctuation in text are never interpreted.
+    """
+    words = TOKEN_RE.findall(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def search_todos(text, completed=None, limit=20):
+    """
+    The todos matching text, best first (by bm25, title matches weighted
+    above description matches), at most limit of them. completed=True or
+    False keeps only completed or pending todos.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    table = Todo._meta.db_table
+    where = f"{FTS_TABLE} MATCH %s"
+    params = [query]
+    if completed is not None:
+        where += f" AND {table}.completed = %s"
+        params.append(completed)
+    sql = (
+        f"SELECT {table}.* FROM {FTS_TABLE} JOIN {table} ON {table}.id = {FTS_TABLE}.rowid "
+        f"WHERE {where} ORDER BY bm25({FTS_TABLE}, %s, %s), {table}.id DESC LIMIT %s"
+    )
+    return list(Todo.objects.raw(sql, params + [TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit]))
+
+
+def filter_matching(queryset, text):
+    """queryset narrowed down to the todos matching text (unranked, keeps its own ordering)"""
+    query = fts_query(text)
+    if query is None:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query]))
@@ -1,7 +1,21 @@
+import json
+
+from django.db import connection
+from django.db.models import Q
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.utils import timezone
+from django.contrib.auth.models import User
 from .models import Todo
+from .search import search_todos
+
+
+def record_queries(statements):
+    """数据库 execute_wrapper：把执行的每条 SQL 语句追加到 statements"""
+    def wrapper(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+    return wrapper
 
 
 class TodoModelTest(TestCase):
@@ -48,6 +62,50 @@ class TodoModelTest(TestCase):
         self.assertTrue(todo.description == "" or todo.description is None)
 
 
+class TodoIndexTest(TestCase):
+    """测试列表、筛选和后台的查询使用索引而不是全表扫描"""
+
+    def setUp(self):
+        """创建测试数据"""
+        for i in range(20):
+            Todo.objects.create(title=f"Todo {i}", completed=i % 3 == 0)
+        self.newest = Todo.objects.order_by('-created_at', '-id').first()
+
+    def assertUsesIndex(self, queryset, index):
+        """断言查询计划使用了指定的索引"""
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_list_uses_created_index(self):
+        """测试列表页（按创建时间倒序）使用 created_at 索引"""
+        todos = Todo.objects.order_by('-created_at', '-id')
+        self.assertUsesIndex(todos[:21], 'todo_created_idx')
+
+    def test_list_cursor_seeks_into_index(self):
+        """测试游标翻页直接定位到索引中的位置"""
+        created_at, pk = self.newest.created_at, self.newest.pk
+        todos = Todo.objects.filter(
+            Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+        ).order_by('-created_at', '-id')
+        self.assertIn("SEARCH", todos[:21].explain())
+        self.assertUsesIndex(todos[:21], 'todo_created_idx')
+
+    def test_status_filters_use_partial_indexes(self):
+        """测试完成/未完成筛选使用各自的部分索引"""
+        todos = Todo.objects.order_by('-created_at', '-id')
+        self.assertUsesIndex(todos.filter(completed=True)[:21], 'todo_completed_idx')
+        self.assertUsesIndex(todos.filter(completed=False)[:21], 'todo_pending_idx')
+
+    def test_admin_filters_use_indexes(self):
+        """测试后台按完成状态和创建时间筛选时使用索引"""
+        self.assertUsesIndex(Todo.objects.filter(completed=True).order_by('-created_at', '-pk'),
+                             'todo_completed_idx')
+        since = timezone.now() - timezone.timedelta(days=7)
+        self.assertUsesIndex(Todo.objects.filter(created_at__gte=since).order_by('-created_at', '-pk'),
+                             'todo_created_idx')
+
+
 class TodoListViewTest(TestCase):
     """测试待办列表视图"""
     
@@ -85,6 +143,156 @@ class TodoListViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'home.html')
 
+    def titles(self, response):
+        """当前页的待办标题（按显示顺序）"""
+        return [todo.title for todo in response.context['todos']]
+
+    def test_todo_list_paginates_with_cursor(self):
+        """测试按游标分页：每页只显示 page_size 条，翻页不重复不遗漏"""
+        for i in range(5):
+            Todo.objects.create(title=f"Todo {i}")
+
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(self.titles(response), ["Todo 4", "Todo 3"])
+        self.assertIsNone(response.context['prev_url'])
+
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(self.titles(response), ["Todo 2", "Todo 1"])
+
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(self.titles(response), ["Todo 0"])
+        self.assertIsNone(response.context['next_url'])
+
+        # 返回上一页
+        response = self.client.get(self.url + response.context['prev_url'])
+        self.assertEqual(self.titles(response), ["Todo 2", "Todo 1"])
+        self.assertIsNotNone(response.context['prev_url'])
+
+    def test_todo_list_cursor_breaks_ties_by_id(self):
+        """测试创建时间相同时按 id 排序，分页仍然稳定"""
+        for i in range(4):
+            Todo.objects.create(title=f"Todo {i}")
+        Todo.objects.update(created_at=timezone.now())
+
+        response = self.client.get(self.url, {'page_size': 3})
+        first_page = self.titles(response)
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(first_page + self.titles(response), ["Todo 3", "Todo 2", "Todo 1", "Todo 0"])
+
+    def test_todo_list_status_filter(self):
+        """测试按完成/未完成状态筛选，且翻页时保留筛选条件"""
+        for i in range(3):
+            Todo.objects.create(title=f"Done {i}", completed=True)
+            Todo.objects.create(title=f"Open {i}")
+
+        response = self.client.get(self.url, {'status': 'completed', 'page_size': 2})
+        self.assertEqual(self.titles(response), ["Done 2", "Done 1"])
+        self.assertIn('status=completed', response.context['next_url'])
+
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(self.titles(response), ["Done 0"])
+
+        response = self.client.get(self.url, {'status': 'pending'})
+        self.assertEqual(self.titles(response), ["Open 2", "Open 1", "Open 0"])
+
+    def test_todo_list_invalid_parameters(self):
+        """测试无效的游标、状态和页大小会被忽略或限制"""
+        for i in range(3):
+            Todo.objects.create(title=f"Todo {i}")
+
+        response = self.client.get(self.url, {'after': 'not-a-cursor', 'status': 'bogus', 'page_size': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), ["Todo 2", "Todo 1", "Todo 0"])
+
+        response = self.client.get(self.url, {'page_size': 0})
+        self.assertEqual(len(response.context['todos']), 1)
+
+        response = self.client.get(self.url, {'page_size': 10000})
+        self.assertEqual(response.context['page_size'], 100)
+
+    def test_todo_list_page_queries_do_not_use_offset(self):
+        """测试翻页查询使用键集条件而不是 OFFSET"""
+        for i in range(5):
+            Todo.objects.create(title=f"Todo {i}")
+        first = self.client.get(self.url, {'page_size': 2})
+
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            self.client.get(self.url + first.context['next_url'])
+        sql = " ".join(statements).upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertIn('LIMIT 3', sql)
+
+
+class TodoSearchTest(TestCase):
+    """测试基于 FTS5 的全文搜索"""
+
+    def setUp(self):
+        """创建测试数据"""
+        self.client = Client()
+        self.url = reverse('todo_list')
+        self.milk = Todo.objects.create(title="Buy milk", description="From the corner shop")
+        self.report = Todo.objects.create(title="Write report", description="Mention the milk prices")
+        self.done = Todo.objects.create(title="Milk the cow", completed=True)
+
+    def titles(self, todos):
+        """待办标题列表"""
+        return [todo.title for todo in todos]
+
+    def test_search_ranks_title_matches_first(self):
+        """测试标题中的匹配排在描述中的匹配之前"""
+        results = self.titles(search_todos("milk"))
+        self.assertEqual(set(results), {"Buy milk", "Write report", "Milk the cow"})
+        self.assertEqual(results[-1], "Write report")
+
+    def test_search_filters_by_status(self):
+        """测试搜索可以按完成状态筛选"""
+        self.assertEqual(self.titles(search_todos("milk", completed=True)), ["Milk the cow"])
+        self.assertNotIn("Milk the cow", self.titles(search_todos("milk", completed=False)))
+
+    def test_search_matches_prefix_of_last_word(self):
+        """测试最后一个词按前缀匹配，其余词需要完整匹配"""
+        self.assertEqual(self.titles(search_todos("rep")), ["Write report"])
+        self.assertEqual(self.titles(search_todos("wri rep")), [])
+        self.assertEqual(self.titles(search_todos("write rep")), ["Write report"])
+
+    def test_search_ignores_query_syntax(self):
+        """测试用户输入中的 FTS5 运算符和标点不会导致错误"""
+        self.assertEqual(self.titles(search_todos('"milk" AND (cow')), [])
+        self.assertEqual(self.titles(search_todos('cow" OR *')), [])
+        self.assertEqual(search_todos('"*()'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """测试修改和删除待办事项后索引保持同步"""
+        self.milk.title = "Buy bread"
+        self.milk.save()
+        self.assertEqual(self.titles(search_todos("bread")), ["Buy bread"])
+        self.assertNotIn("Buy bread", self.titles(search_todos("milk")))
+
+        Todo.objects.filter(pk=self.report.pk).update(description="Nothing to see")
+        self.assertEqual(self.titles(search_todos("milk")), ["Milk the cow"])
+
+        self.done.delete()
+        self.assertEqual(search_todos("milk"), [])
+
+    def test_list_view_search(self):
+        """测试列表页的搜索框"""
+        response = self.client.get(self.url, {'q': 'milk', 'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response.context['todos']), ["Buy milk", "Write report"])
+        self.assertContains(response, 'value="milk"')
+
+        response = self.client.get(self.url, {'q': 'nothing-here'})
+        self.assertContains(response, 'No todos match')
+
+    def test_admin_search_uses_fts(self):
+        """测试后台搜索使用全文索引"""
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('admin:todos_todo_changelist'), {'q': 'cow'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response.context['cl'].result_list), ["Milk the cow"])
+
 
 class TodoCreateViewTest(TestCase):
     """测试创建待办视图"""
@@ -257,7 +465,7 @@ class TodoToggleViewTest(TestCase):
         """测试从未完成切换到完成"""
         self.assertFalse(self.todo.completed)
         
-        response = self.client.get(self.url)
+        response = self.client.post(self.url)
         
         # 应该重定向到列表页
         self.assertEqual(response.status_code, 302)
@@ -272,7 +480,7 @@ class TodoToggleViewTest(TestCase):
         self.todo.completed = True
         self.todo.save()
         
-        response = self.client.get(self.url)
+        response = self.client.post(self.url)
         
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('todo_list'))
@@ -284,9 +492,199 @@ class TodoToggleViewTest(TestCase):
     def test_toggle_nonexistent_todo_returns_404(self):
         """测试切换不存在的待办事项返回 404"""
         url = reverse('todo_toggle', args=[99999])
-        response = self.client.get(url)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 404)
+        # 超出 64 位整数范围的 id 也返回 404，而不是 500
+        response = self.client.post(reverse('todo_toggle', args=[10 ** 23]))
         self.assertEqual(response.status_code, 404)
 
+    def test_toggle_requires_post(self):
+        """测试 GET 请求不能切换状态"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
+        self.todo.refresh_from_db()
+        self.assertFalse(self.todo.completed)
+
+    def test_toggle_is_a_single_update(self):
+        """测试切换只执行一条 UPDATE 语句，并更新 updated_at"""
+        before = self.todo.updated_at
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            self.assertTrue(Todo.objects.toggle(self.todo.pk))
+        self.assertEqual([sql.split()[0] for sql in statements], ['UPDATE'])
+
+        self.todo.refresh_from_db()
+        self.assertTrue(self.todo.completed)
+        self.assertGreater(self.todo.updated_at, before)
+        self.assertFalse(Todo.objects.toggle(self.todo.pk))
+        self.assertIsNone(Todo.objects.toggle(99999))
+
+
+class TodoBulkViewTest(TestCase):
+    """测试批量操作视图"""
+
+    def setUp(self):
+        """设置测试客户端和测试数据"""
+        self.client = Client()
+        self.url = reverse('todo_bulk')
+        self.todos = [Todo.objects.create(title=f"Todo {i}") for i in range(4)]
+        self.ids = [todo.pk for todo in self.todos[:3]]
+
+    def test_bulk_complete_and_uncomplete(self):
+        """测试批量完成和取消完成，每次只执行一条语句"""
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            response = self.client.post(self.url, {'action': 'complete', 'ids': self.ids})
+        self.assertRedirects(response, reverse('todo_list'))
+        self.assertEqual([sql.split()[0] for sql in statements], ['UPDATE'])
+        self.assertEqual(Todo.objects.filter(completed=True).count(), 3)
+        self.assertFalse(Todo.objects.get(pk=self.todos[3].pk).completed)
+
+        self.client.post(self.url, {'action': 'uncomplete', 'ids': self.ids[:2]})
+        self.assertEqual(list(Todo.objects.filter(completed=True).values_list('pk', flat=True)), [self.ids[2]])
+
+    def test_bulk_delete(self):
+        """测试批量删除只执行一条 DELETE 语句"""
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            response = self.client.post(self.url, {'action': 'delete', 'ids': self.ids})
+        self.assertRedirects(response, reverse('todo_list'))
+        self.assertEqual([sql.split()[0] for sql in statements], ['DELETE'])
+        self.assertEqual(list(Todo.objects.values_list('pk', flat=True)), [self.todos[3].pk])
+
+    def test_bulk_rejects_bad_requests(self):
+        """测试无效的操作、无效的 id 和 GET 请求被拒绝"""
+        self.assertEqual(self.client.post(self.url, {'action': 'archive', 'ids': self.ids}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'action': 'delete', 'ids': ['x']}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'action': 'delete', 'ids': [str(10 ** 23)]}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(Todo.objects.count(), 4)
+
+
+class TodoApiTest(TestCase):
+    """测试 JSON API"""
+
+    def setUp(self):
+        """设置测试客户端和测试数据"""
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse('api_todos')
+        self.todos = [Todo.objects.create(title=f"Todo {i}", completed=i % 2 == 0) for i in range(5)]
+
+    def send(self, method, data):
+        """发送 JSON 请求体"""
+        return getattr(self.client, method)(self.url, json.dumps(data), content_type='application/json')
+
+    def test_list_paginates_with_cursor(self):
+        """测试列表接口按游标分页"""
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([todo['title'] for todo in data['results']], ["Todo 4", "Todo 3", "Todo 2"])
+
+        data = self.client.get(self.url, {'page_size': 3, 'after': data['next']}).json()
+        self.assertEqual([todo['title'] for todo in data['results']], ["Todo 1", "Todo 0"])
+        self.assertIsNone(data['next'])
+
+    def test_list_sparse_fieldsets_and_status(self):
+        """测试只返回请求的字段，并可按状态筛选"""
+        data = self.client.get(self.url, {'fields': 'title', 'status': 'completed'}).json()
+        self.assertEqual(data['results'], [
+            {'id': self.todos[i].pk, 'title': f"Todo {i}"} for i in (4, 2, 0)
+        ])
+
+    def test_list_rejects_bad_parameters(self):
+        """测试无效的字段、状态和游标返回 400"""
+        for params in ({'fields': 'title,secret'}, {'status': 'bogus'}, {'after': 'nope'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_retrieve(self):
+        """测试获取单个待办事项"""
+        todo = self.todos[1]
+        response = self.client.get(reverse('api_todo', args=[todo.pk]), {'fields': 'title,completed'})
+        self.assertEqual(response.json(), {'id': todo.pk, 'title': "Todo 1", 'completed': False})
+
+        response = self.client.get(reverse('api_todo', args=[99999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_create(self):
+        """测试批量创建（不需要 CSRF token），只执行 INSERT 语句"""
+        items = [{'title': f"New {i}", 'description': "API"} for i in range(50)] + [{'title': "Done", 'completed': True}]
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            response = self.send('post', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual({sql.split()[0] for sql in statements}, {'INSERT'})
+
+        results = response.json()['results']
+        self.assertEqual(len(results), 51)
+        self.assertTrue(all(result['id'] for result in results))
+        self.assertIsNotNone(results[0]['created_at'])
+        self.assertTrue(Todo.objects.get(title="Done").completed)
+        self.assertEqual(Todo.objects.filter(description="API").count(), 50)
+
+    def test_bulk_create_validates_every_item(self):
+        """测试任何一项无效时不创建任何待办事项"""
+        for items in ([{'title': "ok"}, {'description': "no title"}],
+                      [{'title': "ok"}, {'title': "x", 'completed': "yes"}],
+                      [{'title': "ok", 'created_at': "2020-01-01"}],
+                      [{'title': "ok", 'id': self.todos[0].pk}],
+                      {'title': "not a list"}):
+            response = self.send('post', items)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, "{", content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Todo.objects.count(), 5)
+
+    def test_writes_require_json_content_type(self):
+        """测试非 application/json 的写请求返回 415（防止跨站表单绕过 CSRF）"""
+        body = '[{"title":"pwned","description":"="}]'
+        for method in ('post', 'patch'):
+            response = getattr(self.client, method)(self.url, body, content_type='text/plain')
+            self.assertEqual(response.status_code, 415)
+        response = self.client.post(self.url, {'title': "pwned"})
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Todo.objects.filter(title="pwned").exists())
+
+    def test_bulk_update(self):
+        """测试批量部分更新：一条 SELECT 和批量 UPDATE，并更新 updated_at"""
+        first, second = self.todos[0], self.todos[1]
+        updated_before = second.updated_at
+        statements = []
+        with connection.execute_wrapper(record_queries(statements)):
+            response = self.send('patch', [
+                {'id': first.pk, 'completed': False},
+                {'id': second.pk, 'title': "Renamed", 'completed': True},
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([sql.split()[0] for sql in statements], ['SELECT', 'UPDATE'])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.completed)
+        self.assertEqual(first.title, "Todo 0")
+        self.assertEqual((second.title, second.completed), ("Renamed", True))
+        self.assertGreater(second.updated_at, updated_before)
+        self.assertEqual({result['id'] for result in response.json()['results']}, {first.pk, second.pk})
+
+    def test_bulk_update_rejects_unknown_ids(self):
+        """测试更新不存在的待办事项返回 404，且不修改任何数据"""
+        response = self.send('patch', [{'id': self.todos[0].pk, 'title': "Changed"}, {'id': 99999, 'title': "x"}])
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('99999', response.json()['error'])
+        self.assertFalse(Todo.objects.filter(title="Changed").exists())
+
+        for items in ([{'title': "no id"}], [{'id': 10 ** 23, 'title': "x"}]):
+            response = self.send('patch', items)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('id', response.json()['error'])
+
+    def test_method_not_allowed(self):
+        """测试不支持的请求方法返回 405"""
+        self.assertEqual(self.client.delete(self.url).status_code, 405)
+        self.assertEqual(self.client.post(reverse('api_todo', args=[self.todos[0].pk])).status_code, 405)
+
 
 class TodoURLTest(TestCase):
     """测试 URL 路由"""
@@ -315,3 +713,13 @@ class TodoURLTest(TestCase):
         """测试切换状态 URL"""
         url = reverse('todo_toggle', args=[1])
         self.assertEqual(url, '/toggle/1/')
+
+    def test_todo_bulk_url(self):
+        """测试批量操作 URL"""
+        url = reverse('todo_bulk')
+        self.assertEqual(url, '/bulk/')
+
+    def test_api_urls(self):
+        """测试 API URL"""
+        self.assertEqual(reverse('api_todos'), '/api/todos/')
+        self.assertEqual(reverse('api_todo', args=[1]), '/api/todos/1/')
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.todo_list, name='todo_list'),
@@ -7,5 +7,8 @@ urlpatterns = [
     path('update/<int:pk>/', views.todo_update, name='todo_update'),
     path('delete/<int:pk>/', views.todo_delete, name='todo_delete'),
     path('toggle/<int:pk>/', views.todo_toggle, name='todo_toggle'),
+    path('bulk/', views.todo_bulk, name='todo_bulk'),
+    path('api/todos/', api.todo_collection, name='api_todos'),
+    path('api/todos/<int:pk>/', api.todo_detail, name='api_todo'),
 ]
 
@@ -1,12 +1,127 @@
+import base64
+import binascii
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.http import Http404, HttpResponseBadRequest
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 from .models import Todo
+from .search import search_todos
 
 # Create your views here.
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+STATUS_FILTERS = {'completed': True, 'pending': False}
+
+
+def encode_cursor(created_at, pk):
+    """Opaque cursor pointing at a todo's position in the (created_at, id) ordering"""
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor made by encode_cursor, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+# Both cursor conditions compare (created_at, id) with a plain range on created_at
+# first, so that SQLite seeks into the index instead of scanning it from the top
+
+def older_than(created_at, pk):
+    """Condition for the todos after a cursor in the newest-first ordering"""
+    return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+
+
+def newer_than(created_at, pk):
+    """Condition for the todos before a cursor in the newest-first ordering"""
+    return Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(pk__gt=pk))
+
+
+def parse_page_size(value):
+    """Page size from the query string, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+
 def todo_list(request):
-    """Display all todos"""
+    """
+    Display one page of todos, newest first.
+
+    Pages are found with a keyset on (created_at, id) rather than an OFFSET,
+    so every page costs the same however deep it is. Query parameters:
+    status ('completed' or 'pending'), page_size, and after/before (cursors
+    from the next/previous links).
+
+    With a search query (q) it shows instead the page_size best matches,
+    ranked by the full-text index.
+    """
+    query = request.GET.get('q', '').strip()
+    status = request.GET.get('status')
+    page_size = parse_page_size(request.GET.get('page_size'))
+    after = decode_cursor(request.GET.get('after', ''))
+    before = decode_cursor(request.GET.get('before', '')) if after is None else None
+
     todos = Todo.objects.all()
-    return render(request, 'todos/todo_list.html', {'todos': todos})
+    if status in STATUS_FILTERS:
+        todos = todos.filter(completed=STATUS_FILTERS[status])
+    else:
+        status = None
+
+    if query:
+        page = search_todos(query, completed=STATUS_FILTERS.get(status), limit=page_size)
+        has_prev = has_next = False
+    elif before is not None:
+        todos = todos.filter(newer_than(*before))
+        page = list(todos.order_by('created_at', 'id')[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        if after is not None:
+            todos = todos.filter(older_than(*after))
+        page = list(todos.order_by('-created_at', '-id')[:page_size + 1])
+        has_next = len(page) > page_size
+        page = page[:page_size]
+        has_prev = after is not None
+
+    # Parameters kept by the filter links, then by the next/previous links too
+    kept = {'page_size': page_size} if page_size != DEFAULT_PAGE_SIZE else {}
+    if query:
+        kept['q'] = query
+    filtered = {'status': status, **kept} if status else kept
+
+    def list_url(params):
+        return '?' + urlencode(params)
+
+    next_url = prev_url = None
+    if page and has_next:
+        next_url = list_url({**filtered, 'after': encode_cursor(page[-1].created_at, page[-1].pk)})
+    if page and has_prev:
+        prev_url = list_url({**filtered, 'before': encode_cursor(page[0].created_at, page[0].pk)})
+
+    return render(request, 'todos/todo_list.html', {
+        'todos': page,
+        'query': query,
+        'status': status,
+        'page_size': page_size,
+        'next_url': next_url,
+        'prev_url': prev_url,
+        'filters': [
+            (label, list_url({'status': name, **kept} if name else kept), name == status)
+            for label, name in (('All', None), ('Pending', 'pending'), ('Completed', 'completed'))
+        ],
+    })
 
 def todo_create(request):
     """Create a new todo"""
@@ -36,9 +151,31 @@ def todo_delete(request, pk):
         return redirect('todo_list')
     return render(request, 'todos/todo_confirm_delete.html', {'todo': todo})
 
+@require_POST
 def todo_toggle(request, pk):
-    """Toggle todo completion status"""
-    todo = get_object_or_404(Todo, pk=pk)
-    todo.completed = not todo.completed
-    todo.save()
+    """Toggle todo completion status (one UPDATE statement)"""
+    if Todo.objects.toggle(pk) is None:
+        raise Http404("No Todo matches the given query.")
+    return redirect('todo_list')
+
+BULK_ACTIONS = ('complete', 'uncomplete', 'delete')
+
+@require_POST
+def todo_bulk(request):
+    """Complete, uncomplete or delete the selected todos (ids) in one statement"""
+    action = request.POST.get('action')
+    if action not in BULK_ACTIONS:
+        return HttpResponseBadRequest(f"Unknown action, expected one of {', '.join(BULK_ACTIONS)}")
+    try:
+        ids = [int(pk) for pk in request.POST.getlist('ids')]
+    except ValueError:
+        return HttpResponseBadRequest("ids must be integers")
+    if not all(map(Todo.objects.id_in_range, ids)):
+        return HttpResponseBadRequest("ids out of range")
+
+    todos = Todo.objects.filter(pk__in=ids)
+    if action == 'delete':
+        todos.delete()
+    else:
+        todos.set_completed(action == 'complete')
     return redirect('todo_list')
@@ -0,0 +1,74 @@
+"""Benchmark for counting many terms at once vs calling count_word_in_text per term (runs offline)"""
+
+import argparse
+import time
+
+import numpy as np
+
+from analyze import count_terms
+from bench_search import make_vocabulary
+from main import count_word_in_text
+
+# The plain function behind the @mcp.tool
+count_word = count_word_in_text.fn
+
+
+def make_page(num_words: int, vocab_size: int = 5000, seed: int = 42) -> str:
+    """Generate a markdown-ish page of Zipf-distributed words"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(vocab_size, seed))
+    ranks = np.arange(1, vocab_size + 1)
+    probabilities = (1 / ranks) / (1 / ranks).sum()
+    words = vocabulary[rng.choice(vocab_size, size=num_words, p=probabilities)]
+    lines = [" ".join(words[i:i + 12]) + "." for i in range(0, num_words, 12)]
+    return "\n".join(lines)
+
+
+def time_best(fn, repeat: int = 3) -> float:
+    """Best wall time of repeat runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_count(text: str, terms: list[str]) -> dict:
+    """Time count_word_in_text in a loop against count_terms in both modes"""
+    loop = time_best(lambda: {term: count_word(text, term) for term in terms})
+    substring = time_best(lambda: count_terms(text, terms, mode="substring"))
+    word = time_best(lambda: count_terms(text, terms, mode="word"))
+
+    expected = {term: count_word(text, term) for term in terms}
+    return {
+        'loop_ms': loop * 1000,
+        'substring_ms': substring * 1000,
+        'word_ms': word * 1000,
+        'same_counts': count_terms(text, terms, mode="substring") == expected,
+    }
+
+
+def main():
+    """Run the counting benchmark for a growing number of terms"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=200_000, help="number of words on the page")
+    parser.add_argument("--terms", type=int, nargs="+", default=[1, 10, 100, 1000], help="numbers of terms to count")
+    args = parser.parse_args()
+
+    text = make_page(args.words)
+    vocabulary = make_vocabulary(5000)
+
+    print("=" * 70)
+    print(f"count_terms vs count_word_in_text loop: {len(text) / 1e6:.1f} MB page")
+    print("=" * 70)
+    for num_terms in args.terms:
+        terms = vocabulary[:num_terms]
+        stats = bench_count(text, terms)
+        print(f"{num_terms:>5} terms: loop {stats['loop_ms']:9.1f} ms | substring {stats['substring_ms']:8.1f} ms "
+              f"({stats['loop_ms'] / stats['substring_ms']:5.1f}x) | word {stats['word_ms']:7.1f} ms "
+              f"({stats['loop_ms'] / stats['word_ms']:5.1f}x) | same counts {stats['same_counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Benchmarks for the fastmcp docs search (runs offline against a synthetic
+corpus, or a local copy of the docs with --corpus).
+
+For each engine it reports index build time, peak RSS, snapshot load time,
+query latency percentiles and throughput, and recall on a labelled query
+set, so a change to the search can be judged on both speed and quality.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bm25 import tokenize
+from search import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    ENGINES,
+    build_index,
+    chunk_document,
+    load_index,
+    process_files,
+    save_index,
+    search_docs,
+    search_many,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "do", "fi", "gu", "ha", "je"]
+
+
+def make_vocabulary(size: int, seed: int = 42) -> list[str]:
+    """Generate size distinct pronounceable pseudo-words"""
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return sorted(words)
+
+
+def make_corpus(num_docs: int = 2000, words_per_doc: int = 300, vocab_size: int = 5000, seed: int = 42) -> list[dict]:
+    """
+    Generate markdown documents whose words follow a Zipf distribution,
+    like natural text: a few very common terms and a long tail of rare ones.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(vocab_size, seed))
+    ranks = np.arange(1, vocab_size + 1)
+    probabilities = (1 / ranks) / (1 / ranks).sum()
+
+    documents = []
+    for i in range(num_docs):
+        words = vocabulary[rng.choice(vocab_size, size=words_per_doc, p=probabilities)]
+        sections = np.array_split(words, 3)
+        content = f"# {' '.join(sections[0][:3])}\n\n" + "\n\n".join(
+            f"## {' '.join(section[:2])}\n\n{' '.join(section)}" for section in sections
+        )
+        documents.append({'content': content, 'filename': f"docs/section{i % 20}/page{i}.md"})
+    return documents
+
+
+def make_queries(num_queries: int, vocab_size: int = 5000, seed: int = 7) -> list[str]:
+    """Generate 1-3 word queries, mostly from the mid-frequency part of the vocabulary"""
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(vocab_size)
+    return [
+        " ".join(vocabulary[j] for j in rng.integers(10, vocab_size // 2, size=rng.integers(1, 4)))
+        for _ in range(num_queries)
+    ]
+
+
+def load_corpus(path: str | None, num_docs: int) -> list[dict]:
+    """
+    Load the markdown files under path (a directory or a zip archive), or
+    generate num_docs synthetic documents, and split them into passages
+    the way load_or_build_index does.
+    """
+    if path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            documents = process_files(path)
+    else:
+        documents = make_corpus(num_docs)
+    return [chunk for doc in documents for chunk in chunk_document(doc, CHUNK_SIZE, CHUNK_OVERLAP)]
+
+
+def make_labelled_queries(
+    passages: list[dict], num_queries: int, skip_common: int = 100, seed: int = 11
+) -> list[tuple[str, str]]:
+    """
+    Build a known-item query set: each query is 2-3 words sampled from one
+    passage (skipping the skip_common most frequent words of the corpus),
+    labelled with the file that passage came from.
+    Returns a list of (query, relevant filename) pairs.
+    """
+    rng = np.random.default_rng(seed)
+    frequencies = Counter(term for passage in passages for term in set(tokenize(passage['content'])))
+    common = {term for term, _ in frequencies.most_common(skip_common)}
+
+    labelled = []
+    while len(labelled) < num_queries:
+        passage = passages[rng.integers(len(passages))]
+        terms = sorted(set(tokenize(passage['content'])) - common)
+        if len(terms) < 3:
+            continue
+        words = rng.choice(terms, size=rng.integers(2, 4), replace=False)
+        labelled.append((" ".join(words), passage['filename']))
+    return labelled
+
+
+def evaluate_recall(index, labelled: list[tuple[str, str]], num_results: int = 5) -> dict:
+    """
+    Score the index on a labelled query set:
+    recall@1 and recall@num_results (share of queries whose relevant file is
+    in the top 1 / top num_results files) and the mean reciprocal rank.
+    """
+    hits_at_1 = hits_at_k = reciprocal_ranks = 0.0
+    for query, relevant in labelled:
+        filenames = [doc['filename'] for doc in search_docs(index, query, num_results)]
+        if relevant in filenames:
+            rank = filenames.index(relevant) + 1
+            hits_at_1 += rank == 1
+            hits_at_k += 1
+            reciprocal_ranks += 1 / rank
+    return {
+        'recall@1': hits_at_1 / len(labelled),
+        f'recall@{num_results}': hits_at_k / len(labelled),
+        'mrr': reciprocal_ranks / len(labelled),
+    }
+
+
+def bench_latency(index, queries: list[str], num_results: int = 5) -> dict:
+    """Time search_docs one query at a time: latency percentiles (ms) and queries per second"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search_docs(index, query, num_results)
+        latencies.append(time.perf_counter() - start)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'qps': len(queries) / sum(latencies)}
+
+
+def bench_snapshot_load(index) -> float | None:
+    """Save the index as a snapshot and time loading it back (seconds); None if the engine has no snapshots"""
+    if not hasattr(index, 'vectorizers'):
+        return None
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        save_index(index, tmp, source_hash="bench")
+        start = time.perf_counter()
+        loaded = load_index(tmp, source_hash="bench")
+        search_docs(loaded, "warm up")
+        return time.perf_counter() - start
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def bench_engine(engine: str, passages: list[dict], labelled: list[tuple[str, str]], num_results: int = 5) -> dict:
+    """
+    Build and benchmark one engine. Meant to run in a fresh process (see
+    main) so the peak RSS belongs to this engine alone.
+    """
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        index = build_index(passages, engine=engine)
+    build_seconds = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+
+    queries = [query for query, _ in labelled]
+    return {
+        'engine': engine,
+        'passages': len(passages),
+        'build_s': build_seconds,
+        'peak_rss_mb': rss_after,
+        'build_rss_mb': rss_after - rss_before if rss_after is not None else None,
+        'snapshot_load_s': bench_snapshot_load(index),
+        **bench_latency(index, queries, num_results),
+        **evaluate_recall(index, labelled, num_results),
+        **{f'many_{key}': value for key, value in bench_search_many(index, queries, num_results).items()},
+    }
+
+
+def format_value(value, spec: str, unit: str) -> str:
+    """Format a number with its unit, or '-' when it was not measured"""
+    return "-" if value is None else f"{value:{spec}} {unit}"
+
+
+def bench_search_many(index, queries: list[str], num_results: int = 5) -> dict:
+    """Compare the throughput of search_many with calling search_docs in a loop"""
+    start = time.perf_counter()
+    looped = [search_docs(index, query, num_results) for query in queries]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = search_many(index, queries, num_results)
+    batch_seconds = time.perf_counter() - start
+
+    same = sum(
+        [doc['filename'] for doc in a] == [doc['filename'] for doc in b]
+        for a, b in zip(looped, batched)
+    )
+    return {
+        'loop_qps': len(queries) / loop_seconds,
+        'batch_qps': len(queries) / batch_seconds,
+        'speedup': loop_seconds / batch_seconds,
+        'same_results': same / len(queries),
+    }
+
+
+def main():
+    """Benchmark every engine and optionally fail when recall drops below a threshold"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory or zip of markdown files (default: synthetic corpus)")
+    parser.add_argument("--docs", type=int, default=2000, help="number of synthetic documents")
+    parser.add_argument("--queries", type=int, default=500, help="number of labelled queries")
+    parser.add_argument("--num-results", type=int, default=5, help="results per query")
+    parser.add_argument("--engine", choices=ENGINES, action="append", help="engine(s) to benchmark (default: all)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--min-recall", type=float, help="exit with an error if recall@k is below this")
+    args = parser.parse_args()
+
+    passages = load_corpus(args.corpus, args.docs)
+    labelled = make_labelled_queries(passages, args.queries)
+    recall_key = f"recall@{args.num_results}"
+
+    print("=" * 70)
+    print(f"Search benchmark: {args.corpus or f'{args.docs} synthetic documents'}, "
+          f"{len(passages)} passages, {len(labelled)} labelled queries")
+    print("=" * 70)
+
+    results = []
+    # A fresh process per engine, so each peak RSS is measured on its own
+    context = multiprocessing.get_context("spawn")
+    for engine in args.engine or ENGINES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            stats = pool.submit(bench_engine, engine, passages, labelled, args.num_results).result()
+        results.append(stats)
+
+        print(f"\n{engine}")
+        print(f"  build      {stats['build_s']:.2f} s | peak RSS {format_value(stats['peak_rss_mb'], '.0f', 'MB')} "
+              f"({format_value(stats['build_rss_mb'], '+.0f', 'MB')} for the index) | "
+              f"snapshot load {format_value(stats['snapshot_load_s'], '.3f', 's')}")
+        print(f"  latency    p50 {stats['p50_ms']:.2f} ms | p95 {stats['p95_ms']:.2f} ms | "
+              f"p99 {stats['p99_ms']:.2f} ms | {stats['qps']:.0f} q/s")
+        print(f"  batched    {stats['many_batch_qps']:.0f} q/s with search_many "
+              f"({stats['many_speedup']:.1f}x, same results {stats['many_same_results']:.0%})")
+        print(f"  relevance  recall@1 {stats['recall@1']:.3f} | {recall_key} {stats[recall_key]:.3f} | "
+              f"MRR {stats['mrr']:.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.min_recall is not None:
+        failed = [stats['engine'] for stats in results if stats[recall_key] < args.min_recall]
+        if failed:
+            print(f"\n{recall_key} below {args.min_recall} for: {', '.join(failed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
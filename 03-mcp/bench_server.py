@@ -0,0 +1,201 @@
+"""
+Load test for the MCP server (runs offline).
+
+Drives the FastMCP app in main.py through an in-memory client, with
+r.jina.ai replaced by a local fake server with configurable latency and
+page size, and reports requests per second, latency percentiles and
+memory for each scenario and concurrency level.
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from fastmcp import Client
+
+import fetch
+import main
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCENARIOS = ("miss", "hit", "analyze", "handle")
+SCENARIO_HELP = {
+    'miss': "scrape_web on a new URL every call (every call goes to the fake server)",
+    'hit': "scrape_web on a few URLs (served from the page cache)",
+    'analyze': "analyze_page on a few URLs (counts and snippets computed on the server)",
+    'handle': "scrape_web with as_handle=True on a few URLs (only a handle is returned)",
+}
+
+
+class FakeJinaHandler(BaseHTTPRequestHandler):
+    """Answers every GET after latency seconds with page_size bytes of markdown"""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    page = b""
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/markdown; charset=utf-8")
+            self.send_header("Content-Length", str(len(self.page)))
+            self.end_headers()
+            self.wfile.write(self.page)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_page(size: int) -> bytes:
+    """A markdown page of about size bytes"""
+    line = "Data engineering with data pipelines, metadata and machine learning.\n"
+    return ("# Fake page\n\n" + line * (size // len(line) + 1)).encode('utf-8')[:size]
+
+
+def start_fake_jina(latency: float, page_size: int) -> ThreadingHTTPServer:
+    """Start the fake r.jina.ai on a free local port, in a background thread"""
+    handler = type("Handler", (FakeJinaHandler,), {'latency': latency, 'page': make_page(page_size)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def current_rss_mb() -> float | None:
+    """Resident set size of this process right now, in MB (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / (1024 * 1024) if resource else None
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def scenario_call(scenario: str, i: int) -> tuple[str, dict]:
+    """The tool name and arguments of call number i of a scenario"""
+    url = f"https://example.com/page{i}" if scenario == "miss" else f"https://example.com/page{i % 10}"
+    if scenario == "analyze":
+        return "analyze_page", {"url": url, "terms": ["data", "machine learning"], "snippet_terms": ["metadata"]}
+    if scenario == "handle":
+        return "scrape_web", {"url": url, "as_handle": True}
+    return "scrape_web", {"url": url}
+
+
+async def run_load(client: Client, scenario: str, num_requests: int, concurrency: int) -> dict:
+    """
+    Make num_requests calls of a scenario with at most concurrency in flight.
+    Returns throughput, latency percentiles (ms), errors and memory (MB).
+    """
+    latencies = []
+    errors = 0
+    rss_samples = []
+    next_call = iter(range(num_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_call:
+            name, arguments = scenario_call(scenario, i)
+            start = time.perf_counter()
+            result = await client.call_tool(name, arguments, raise_on_error=False)
+            latencies.append(time.perf_counter() - start)
+            text = result.content[0].text if result.content else ""
+            errors += result.is_error or text.startswith("Error scraping")
+
+    async def sample_memory():
+        while True:
+            rss_samples.append(current_rss_mb())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_memory())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    rss = [sample for sample in rss_samples if sample is not None]
+    return {
+        'rps': num_requests / elapsed,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': max(latencies) * 1000,
+        'errors': errors,
+        'rss_mb': max(rss) if rss else None,
+    }
+
+
+async def run_benchmark(args) -> list[dict]:
+    """Run every scenario at every concurrency level against a fresh fake server"""
+    server = start_fake_jina(args.latency / 1000, args.page_kb * 1024)
+    main.JINA_BASE_URL = f"http://127.0.0.1:{server.server_port}/"
+    main.fetcher = fetch.Fetcher(per_host_limit=args.per_host_limit)
+
+    results = []
+    try:
+        async with Client(main.mcp) as client:
+            for scenario in args.scenario or SCENARIOS:
+                for concurrency in args.concurrency:
+                    # Start every run cold, so 'miss' never hits and 'hit' warms up the same way
+                    main.page_cache = fetch.ResponseCache()
+                    stats = await run_load(client, scenario, args.requests, concurrency)
+                    results.append({'scenario': scenario, 'concurrency': concurrency, **stats})
+                    print(f"{scenario:>8} x{concurrency:<4} {stats['rps']:8.0f} req/s | "
+                          f"p50 {stats['p50_ms']:7.1f} ms | p95 {stats['p95_ms']:7.1f} ms | "
+                          f"p99 {stats['p99_ms']:7.1f} ms | max {stats['max_ms']:7.1f} ms | "
+                          f"RSS {stats['rss_mb'] or 0:6.0f} MB | errors {stats['errors']}")
+    finally:
+        await main.fetcher.aclose()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def main_cli():
+    """Parse the options and run the load test"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="calls per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="calls in flight")
+    parser.add_argument("--latency", type=float, default=50, help="fake server latency, in ms")
+    parser.add_argument("--page-kb", type=int, default=64, help="fake page size, in KB")
+    parser.add_argument("--per-host-limit", type=int, default=fetch.PER_HOST_LIMIT,
+                        help="concurrent requests per host in the fetcher")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="scenario(s) to run (default: all): " +
+                             "; ".join(f"{name}: {text}" for name, text in SCENARIO_HELP.items()))
+    args = parser.parse_args()
+
+    print("=" * 100)
+    print(f"MCP server load test: fake r.jina.ai with {args.latency:.0f} ms latency and {args.page_kb} KB pages, "
+          f"{args.requests} calls per run")
+    print("=" * 100)
+    asyncio.run(run_benchmark(args))
+
+    print(f"\nPeak RSS: {peak_rss_mb() or 0:.0f} MB")
+    print("\nServer-side time per tool (network vs processing):")
+    for name, stats in main.tool_metrics.snapshot()['tools'].items():
+        print(f"  {name:>12}: {stats['calls']:6} calls | network {stats['network_seconds']:8.2f} s | "
+              f"processing {stats['processing_seconds']:8.2f} s")
+
+
+if __name__ == "__main__":
+    main_cli()
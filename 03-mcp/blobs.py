@@ -0,0 +1,83 @@
+"""Server-side store for large tool outputs, referenced by content handles instead of passed by value"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+BLOB_MAX_BYTES = 64 * 1024 * 1024
+BLOB_MAX_COUNT = 1000
+PREVIEW_CHARS = 200
+
+HANDLE_PREFIX = "blob:"
+HANDLE_RE = re.compile(r'blob:[0-9a-f]{16}')
+
+
+class BlobStore:
+    """
+    A bounded, in-memory store of texts addressed by content handles.
+
+    A handle is 'blob:' followed by the first 16 hex digits of the text's
+    SHA-256, so storing the same text twice gives the same handle. Blobs
+    are kept in LRU order and the least recently used ones are evicted
+    beyond max_count blobs or max_bytes bytes; reading an evicted handle
+    raises a ValueError.
+    """
+
+    def __init__(self, max_bytes: int = BLOB_MAX_BYTES, max_count: int = BLOB_MAX_COUNT):
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.counters = {'puts': 0, 'reads': 0, 'evictions': 0}
+        self._blobs = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> dict:
+        """
+        Store text and return its handle:
+            {'handle', 'length', 'preview'}
+        where length is in characters and preview the first PREVIEW_CHARS of them.
+        """
+        data = text.encode('utf-8')
+        handle = HANDLE_PREFIX + hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            self.counters['puts'] += 1
+            if handle in self._blobs:
+                self._blobs.move_to_end(handle)
+            else:
+                self._blobs[handle] = (text, len(data))
+                self._bytes += len(data)
+                while len(self._blobs) > 1 and (len(self._blobs) > self.max_count or self._bytes > self.max_bytes):
+                    _, (_, size) = self._blobs.popitem(last=False)
+                    self._bytes -= size
+                    self.counters['evictions'] += 1
+        return {'handle': handle, 'length': len(text), 'preview': text[:PREVIEW_CHARS]}
+
+    def read(self, handle: str, start: int = 0, end: int | None = None) -> str:
+        """The text of handle, or the characters [start:end] of it."""
+        with self._lock:
+            if handle not in self._blobs:
+                raise ValueError(f"Unknown content handle {handle!r} (it may have been evicted)")
+            self._blobs.move_to_end(handle)
+            self.counters['reads'] += 1
+            text, _ = self._blobs[handle]
+        return text[start:end]
+
+    def length(self, handle: str) -> int:
+        """The length of the text of handle, in characters."""
+        with self._lock:
+            if handle not in self._blobs:
+                raise ValueError(f"Unknown content handle {handle!r} (it may have been evicted)")
+            text, _ = self._blobs[handle]
+        return len(text)
+
+    def resolve(self, text_or_handle: str) -> str:
+        """The text a handle points to, or the argument itself if it is not a handle."""
+        if HANDLE_RE.fullmatch(text_or_handle):
+            return self.read(text_or_handle)
+        return text_or_handle
+
+    def stats(self) -> dict:
+        """Counters and the current size of the store"""
+        with self._lock:
+            return {**self.counters, 'blobs': len(self._blobs), 'bytes': self._bytes}
@@ -0,0 +1,254 @@
+"""BM25 search engine for search.py, built on a CSR inverted index"""
+
+import re
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Same tokens as minsearch's TfidfVectorizer: lowercase words of 2+ characters
+TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class BM25Index:
+    """
+    A BM25 search index with the same interface as minsearch.Index.
+
+    Each text field is stored as an inverted index in CSR form: for term t,
+    doc_ids[indptr[t]:indptr[t+1]] are the documents containing it and
+    weights[...] their precomputed BM25 contributions (idf included).
+    A query only touches the postings of its own terms, and the top k
+    documents are selected with a partition instead of a full sort, so
+    query cost grows with the postings of the query terms rather than with
+    the size of the corpus.
+
+    Attributes:
+        text_fields (list): List of text field names to index.
+        keyword_fields (list): List of keyword field names to index.
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+        vocabularies (dict): term -> term id, per text field.
+        postings (dict): (indptr, doc_ids, weights) arrays, per text field.
+        keyword_values (dict): Keyword field values as object arrays, indexed by doc id.
+        docs (list): List of documents indexed.
+    """
+
+    def __init__(self, text_fields, keyword_fields=None, k1=1.2, b=0.75):
+        """
+        Initializes the BM25Index with specified text and keyword fields.
+
+        Args:
+            text_fields (list): List of text field names to index.
+            keyword_fields (list, optional): List of keyword field names to index. Defaults to empty list.
+            k1 (float): Term frequency saturation. Defaults to 1.2.
+            b (float): Document length normalization. Defaults to 0.75.
+        """
+        self.text_fields = text_fields
+        self.keyword_fields = keyword_fields if keyword_fields is not None else []
+        self.k1 = k1
+        self.b = b
+        self.vocabularies = {}
+        self.postings = {}
+        self.keyword_values = {}
+        self.docs = []
+
+    def _fit_field(self, field, docs):
+        """Build the vocabulary and weighted postings of one text field."""
+        vocabulary = {}
+        indptr = [0]
+        indices = []
+        data = []
+        for doc in docs:
+            counts = Counter(tokenize(doc.get(field, '')))
+            for term, count in counts.items():
+                indices.append(vocabulary.setdefault(term, len(vocabulary)))
+                data.append(count)
+            indptr.append(len(indices))
+
+        num_docs = len(docs)
+        counts = csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(num_docs, len(vocabulary))
+        )
+        doc_lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if num_docs and doc_lengths.mean() > 0 else 1.0
+
+        # Term-major (CSC) layout: the postings of each term are contiguous
+        by_term = counts.tocsc()
+        by_term.sort_indices()
+        tf = by_term.data
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths[by_term.indices] / avg_length)
+        df = np.diff(by_term.indptr)
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+        term_ids = np.repeat(np.arange(len(vocabulary)), df)
+        weights = (idf[term_ids] * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+        self.vocabularies[field] = vocabulary
+        self.postings[field] = (by_term.indptr, by_term.indices, weights)
+
+    def fit(self, docs):
+        """
+        Fits the index with the provided documents.
+
+        Args:
+            docs (list of dict): List of documents to index. Each document is a dictionary.
+        """
+        self.docs = docs
+        for field in self.text_fields:
+            self._fit_field(field, docs)
+
+        for field in self.keyword_fields:
+            values = np.empty(len(docs), dtype=object)
+            values[:] = [doc.get(field) for doc in docs]
+            self.keyword_values[field] = values
+
+        return self
+
+    def score(self, query, boost_dict=None, doc_mask=None):
+        """
+        Score the documents matching the query.
+
+        Args:
+            query (str): The search query string.
+            boost_dict (dict): Dictionary of boost scores for text fields.
+            doc_mask (np.ndarray): Optional boolean array over all documents;
+                                   only postings of documents where it is True are scored.
+
+        Returns:
+            tuple: (doc_ids, scores) arrays for every document containing
+                   at least one query term, sorted by doc id.
+        """
+        if boost_dict is None:
+            boost_dict = {}
+
+        query_terms = Counter(tokenize(query))
+        ids_parts = []
+        score_parts = []
+        for field in self.text_fields:
+            vocabulary = self.vocabularies[field]
+            indptr, doc_ids, weights = self.postings[field]
+            boost = boost_dict.get(field, 1)
+            for term, count in query_terms.items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    continue
+                start, end = indptr[term_id], indptr[term_id + 1]
+                term_docs, term_weights = doc_ids[start:end], weights[start:end]
+                if doc_mask is not None:
+                    allowed = doc_mask[term_docs]
+                    term_docs, term_weights = term_docs[allowed], term_weights[allowed]
+                ids_parts.append(term_docs)
+                score_parts.append(term_weights * (count * boost))
+
+        if not ids_parts:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+
+        ids = np.concatenate(ids_parts)
+        contributions = np.concatenate(score_parts)
+        candidates, inverse = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+        return candidates, scores
+
+    def score_many(self, queries, boost_dict=None):
+        """
+        Score many queries at once with a single sparse matrix multiply.
+
+        Args:
+            queries (list of str): The search query strings.
+            boost_dict (dict): Dictionary of boost scores for text fields.
+
+        Returns:
+            csr_matrix: (len(queries), len(docs)) matrix; row i holds the
+                        scores of the documents matching queries[i].
+        """
+        if boost_dict is None:
+            boost_dict = {}
+
+        query_terms = [Counter(tokenize(query)) for query in queries]
+        total = csr_matrix((len(queries), len(self.docs)))
+        for field in self.text_fields:
+            vocabulary = self.vocabularies[field]
+            indptr, doc_ids, weights = self.postings[field]
+            boost = boost_dict.get(field, 1)
+
+            query_indptr = [0]
+            query_indices = []
+            query_data = []
+            for terms in query_terms:
+                for term, count in terms.items():
+                    term_id = vocabulary.get(term)
+                    if term_id is not None:
+                        query_indices.append(term_id)
+                        query_data.append(count * boost)
+                query_indptr.append(len(query_indices))
+
+            query_matrix = csr_matrix(
+                (query_data, query_indices, query_indptr),
+                shape=(len(queries), len(vocabulary))
+            )
+            postings = csr_matrix((weights, doc_ids, indptr), shape=(len(vocabulary), len(self.docs)))
+            total = total + query_matrix @ postings
+
+        return total.tocsr()
+
+    def _filter_mask(self, doc_ids, filter_dict):
+        """Boolean mask of the doc_ids that match all keyword filters."""
+        mask = np.ones(len(doc_ids), dtype=bool)
+        for field, value in filter_dict.items():
+            if field not in self.keyword_fields:
+                continue
+            values = self.keyword_values[field][doc_ids]
+            if value is None:
+                mask &= np.array([v is None for v in values], dtype=bool)
+            else:
+                mask &= values == value
+        return mask
+
+    def search(self, query, filter_dict=None, boost_dict=None, num_results=10, output_ids=False):
+        """
+        Searches the index with the given query, filters, and boost parameters.
+
+        Args:
+            query (str): The search query string.
+            filter_dict (dict): Dictionary of keyword fields to filter by.
+            boost_dict (dict): Dictionary of boost scores for text fields.
+            num_results (int): The number of top results to return. Defaults to 10.
+            output_ids (bool): If True, adds an '_id' field to each document containing its index. Defaults to False.
+
+        Returns:
+            list of dict: List of documents matching the search criteria, ranked by relevance.
+                         If output_ids is True, each document will have an additional '_id' field.
+        """
+        if not self.docs or num_results <= 0:
+            return []
+
+        doc_ids, scores = self.score(query, boost_dict)
+        if filter_dict:
+            mask = self._filter_mask(doc_ids, filter_dict)
+            doc_ids, scores = doc_ids[mask], scores[mask]
+
+        top_ids = top_k(doc_ids, scores, num_results)
+        if output_ids:
+            return [{**self.docs[i], '_id': int(i)} for i in top_ids]
+        return [self.docs[i] for i in top_ids]
+
+
+def top_k(doc_ids, scores, k):
+    """
+    Return the doc ids of the k highest (positive) scores, best first.
+    Uses a partition so only the k winners (and anything tied with the
+    k-th score) get sorted; equal scores are ordered by doc id.
+    """
+    positive = scores > 0
+    doc_ids, scores = doc_ids[positive], scores[positive]
+    if len(scores) > k:
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        winners = scores >= kth_score
+        doc_ids, scores = doc_ids[winners], scores[winners]
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return doc_ids[order]
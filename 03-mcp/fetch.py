@@ -0,0 +1,588 @@
+"""Async HTTP fetching for the scraping tools: a pooled keep-alive client and a response cache"""
+
+import asyncio
+import codecs
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import time
+from collections import OrderedDict, defaultdict, deque
+from pathlib import Path
+
+import httpx
+
+import metrics
+
+TIMEOUT = 30
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+PER_HOST_LIMIT = 8
+
+# Bodies are read in chunks and cut off after this many (decoded) bytes
+MAX_BODY_BYTES = 5 * 1024 * 1024
+TRUNCATION_MARKER = "\n\n[... truncated after {max_bytes} bytes]"
+
+RETRIES = 2
+BACKOFF = 0.5
+MAX_RETRY_AFTER = 30
+# Statuses worth retrying: timeouts, rate limits and transient server errors
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Circuit breaker: open after this many consecutive failures, try again after the reset timeout
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+# Statuses that count as a failure of the host (as opposed to e.g. a 404)
+FAILURE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Hedged requests: send a second copy of a request still running after the
+# host's p95 latency (over the last LATENCY_WINDOW requests, once there are
+# HEDGE_MIN_SAMPLES of them), but never sooner than HEDGE_MIN_DELAY
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+
+CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Expired entries may still be served for this long when the host is failing
+CACHE_MAX_STALE = 24 * 60 * 60
+
+# HTTP/2 needs the optional h2 package (pip install 'httpx[http2]')
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of sending a request to a host whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast against a host that keeps failing.
+
+    Closed: requests go through, and failure_threshold failures in a row
+    open the breaker. Open: requests are rejected with CircuitOpenError
+    until reset_timeout seconds have passed. Half-open: a single trial
+    request goes through; its success closes the breaker again, its
+    failure re-opens it.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    def before_request(self) -> bool:
+        """
+        Raise CircuitOpenError if the request must not be sent.
+        Returns whether it is the trial request of a half-open breaker.
+        """
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = "half-open"
+        if self.state == "open" or (self.state == "half-open" and self._trial_running):
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(
+                f"Circuit open for {self.host} after {self.failures} failures in a row, "
+                f"failing fast (next try in {retry_in:.0f}s)"
+            )
+        if self.state == "half-open":
+            self._trial_running = True
+            return True
+        return False
+
+    def record(self, success: bool | None, trial: bool = False):
+        """Record the outcome of a request (None: it was cancelled before there was one)"""
+        if trial:
+            self._trial_running = False
+        if success is None:
+            return
+        if success:
+            self.failures = 0
+            if trial:
+                self.state = "closed"
+            return
+        self.failures += 1
+        if trial or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class Fetcher:
+    """
+    A shared httpx.AsyncClient with a keep-alive connection pool.
+
+    Requests to the same host reuse open connections (multiplexed over a
+    single connection when HTTP/2 is available), and at most per_host_limit
+    requests run against one host at a time; the rest wait their turn
+    without blocking the event loop.
+
+    Each host also gets a CircuitBreaker, so once a host keeps failing,
+    requests to it fail fast instead of piling up behind the timeout. With
+    hedge, a request still running after the host's p95 latency is sent a
+    second time and whichever copy finishes first wins (see hedged).
+
+    The client belongs to the event loop it was created on. If the fetcher
+    is used from a different loop (e.g. a script calling asyncio.run once per
+    request) a fresh client is created for it.
+    """
+
+    def __init__(
+        self,
+        timeout: float = TIMEOUT,
+        per_host_limit: int = PER_HOST_LIMIT,
+        max_connections: int = MAX_CONNECTIONS,
+        http2: bool | None = None,
+        verify: bool = True,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        hedge: bool = False,
+        hedge_min_delay: float = HEDGE_MIN_DELAY,
+    ):
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2
+        self.verify = verify
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.counters = {'hedged': 0, 'hedge_wins': 0}
+        self.breakers = {}
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._client = None
+        self._loop = None
+        self._host_semaphores = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """The client for the running event loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                verify=self.verify,
+                timeout=self.timeout,
+                limits=self.limits,
+                follow_redirects=True,
+            )
+            self._loop = loop
+            self._host_semaphores = {}
+        return self._client
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """The circuit breaker of a host"""
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+        return self.breakers[host]
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET url through the shared pool and read the body (keyword arguments go to httpx.AsyncClient.stream)"""
+        async with self.stream(url, **kwargs) as response:
+            await response.aread()
+        return response
+
+    @contextlib.asynccontextmanager
+    async def stream(self, url: str, **kwargs):
+        """
+        GET url through the shared pool without reading the body, for read_text.
+        The per-host slot is held until the body has been read, and the request
+        (body included) is cut off with TimeoutError after timeout seconds,
+        which counts as a failure of the host. Raises CircuitOpenError right
+        away if the host's breaker is open.
+        """
+        host = httpx.URL(url).host
+        breaker = self.breaker(host)
+        trial = breaker.before_request()
+        client = self._get_client()
+        success = None
+        try:
+            async with self._host_semaphore(host):
+                start = time.perf_counter()
+                try:
+                    # httpx's timeout applies to each read, this one to the whole request
+                    async with asyncio.timeout(self.timeout):
+                        async with client.stream("GET", url, **kwargs) as response:
+                            success = response.status_code not in FAILURE_STATUSES
+                            yield response
+                except (httpx.TransportError, TimeoutError):
+                    success = False
+                    raise
+                finally:
+                    # Includes reading the body
+                    elapsed = time.perf_counter() - start
+                    metrics.add_network_time(elapsed)
+                    if success:
+                        self._latencies[host].append(elapsed)
+        finally:
+            breaker.record(success, trial)
+
+    def hedge_delay(self, url: str) -> float | None:
+        """Seconds after which a request to url gets hedged, or None if it shouldn't be"""
+        if not self.hedge:
+            return None
+        latencies = self._latencies[httpx.URL(url).host]
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return max(p95, self.hedge_min_delay)
+
+    async def hedged(self, url: str, attempt):
+        """
+        Await attempt() (which requests url), sending a second attempt if the
+        first one is still running after hedge_delay; the first to succeed
+        wins and the other one is cancelled. Without hedging, just awaits attempt().
+        """
+        delay = self.hedge_delay(url)
+        if delay is None:
+            return await attempt()
+
+        first = asyncio.ensure_future(attempt())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            self.counters['hedged'] += 1
+            second = asyncio.ensure_future(attempt())
+            tasks.add(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.counters['hedge_wins'] += 1
+                        return task.result()
+            return first.result()  # both failed: raise the first one's error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Hedging counters and the state of each host's circuit breaker"""
+        return {
+            **self.counters,
+            'breaker_rejections': sum(breaker.rejected for breaker in self.breakers.values()),
+            'breakers': {host: breaker.state for host, breaker in self.breakers.items()},
+        }
+
+    async def aclose(self):
+        """Close the pooled connections of the current client"""
+        if self._client is not None:
+            client, self._client, self._loop = self._client, None, None
+            await client.aclose()
+
+
+async def read_text(response: httpx.Response, max_bytes: int = MAX_BODY_BYTES, sink=None) -> tuple[str | None, bool]:
+    """
+    Read the body of a streamed response chunk by chunk, decoding as it goes.
+
+    At most max_bytes are read; a longer body is cut off there and
+    TRUNCATION_MARKER is appended to the text. With sink, each decoded piece
+    of text is passed to sink(text) as it arrives and the full text is never
+    built; the marker is not passed to it (it isn't part of the page).
+
+    Returns:
+        (text, truncated), where text is None when a sink was given
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    parts = []
+    emit = parts.append if sink is None else sink
+    received = 0
+    truncated = False
+    async for chunk in response.aiter_bytes():
+        if received + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - received]
+            truncated = True
+        received += len(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            emit(text)
+        if truncated:
+            break
+
+    if truncated:
+        # A character cut in half at the limit is dropped
+        if sink is None:
+            parts.append(TRUNCATION_MARKER.format(max_bytes=max_bytes))
+    else:
+        text = decoder.decode(b'', final=True)
+        if text:
+            emit(text)
+    return (None if sink is not None else ''.join(parts)), truncated
+
+
+async def stream_text(fetcher: Fetcher, url: str, sink, max_bytes: int = MAX_BODY_BYTES) -> bool:
+    """
+    Fetch url and pass its body to sink(text) piece by piece (see read_text),
+    bypassing the cache. Returns whether the body was truncated.
+    Raises httpx.HTTPError if the request fails.
+    """
+    async with fetcher.stream(url) as response:
+        response.raise_for_status()
+        _, truncated = await read_text(response, max_bytes, sink)
+    return truncated
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request may succeed if tried again"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+
+def retry_delay(error: Exception, attempt: int, backoff: float = BACKOFF) -> float:
+    """
+    Seconds to wait before the next attempt: the server's Retry-After if it
+    sent one, else exponential backoff with full jitter (a random delay up
+    to backoff * 2**attempt), so clients that failed together don't all
+    retry at the same moment.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get('retry-after', '')
+        if retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_AFTER)
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+async def retry(attempt, retries: int = RETRIES, backoff: float = BACKOFF, timeout: float | None = None,
+                deadline: float | None = None):
+    """
+    Await attempt() until it succeeds, at most retries + 1 times.
+
+    Each try is cut off after timeout seconds. Only retryable errors (see
+    is_retryable) are tried again, after retry_delay; anything else, or the
+    last error, is raised. No try is started (or backoff waited out) past
+    deadline seconds from the first one: the error at hand is raised
+    instead. A try that is running is never cut off by the deadline, so it
+    ends the way the request itself does (see Fetcher.stream).
+    """
+    give_up_at = None if deadline is None else time.monotonic() + deadline
+    for attempt_number in range(retries + 1):
+        try:
+            async with asyncio.timeout(timeout):
+                return await attempt()
+        except Exception as e:
+            if attempt_number == retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt_number, backoff)
+            if give_up_at is not None and time.monotonic() + delay >= give_up_at:
+                raise
+        await asyncio.sleep(delay)
+
+
+class ResponseCache:
+    """
+    A TTL + LRU cache of fetched pages, with conditional revalidation.
+
+    Fresh entries are served straight from memory. Once an entry expires,
+    it is revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page costs a 304 instead of a full download. Concurrent
+    requests for the same URL share one fetch. Entries are kept in LRU
+    order and evicted beyond max_entries / max_bytes; with disk_dir they
+    are also written to disk, so they survive a restart. Each body is
+    streamed and capped at max_body_bytes (see read_text).
+
+    The TTL of an entry comes from the response's Cache-Control header
+    (max-age, no-cache, no-store) and falls back to ttl seconds. While the
+    host is failing (its circuit breaker is open, it timed out, or the error
+    is one worth retrying), an expired entry up to max_stale seconds old is
+    served instead of the error.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl: float = CACHE_TTL, disk_dir: str | None = None, max_body_bytes: int = MAX_BODY_BYTES,
+                 max_stale: float = CACHE_MAX_STALE):
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self.max_body_bytes = max_body_bytes
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.counters = {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'revalidated': 0,
+            'coalesced': 0, 'evictions': 0, 'truncated': 0, 'stale': 0,
+        }
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+
+    def _disk_path(self, url: str) -> Path:
+        return self.disk_dir / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def _lookup(self, url: str) -> dict | None:
+        """The cached entry for url (fresh or not), from memory or disk"""
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+            return entry
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(self._disk_path(url), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        self._store(url, entry, write_disk=False)
+        self.counters['disk_hits'] += 1
+        return entry
+
+    def _store(self, url: str, entry: dict, write_disk: bool = True):
+        """Insert entry as the most recently used one and evict the least recently used beyond the limits"""
+        if 'size' not in entry:
+            entry['size'] = len(entry['text'].encode('utf-8'))
+        previous = self._entries.pop(url, None)
+        if previous is not None:
+            self._bytes -= previous['size']
+        self._entries[url] = entry
+        self._bytes += entry['size']
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted['size']
+            self.counters['evictions'] += 1
+
+        if write_disk and self.disk_dir is not None:
+            path = self._disk_path(url)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, **entry}, f)
+            os.replace(tmp_path, path)
+
+    def _entry_ttl(self, response: httpx.Response) -> float | None:
+        """Seconds the response may be served without revalidation; None if it must not be stored"""
+        directives = [d.strip().lower() for d in response.headers.get('cache-control', '').split(',')]
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        for directive in directives:
+            if directive.startswith('max-age='):
+                try:
+                    return max(0, int(directive[len('max-age='):]))
+                except ValueError:
+                    pass
+        return self.ttl
+
+    async def get_text(self, fetcher: Fetcher, url: str) -> str:
+        """
+        Return the body of url, from the cache when it's fresh.
+        Raises httpx.HTTPError if it has to be fetched and that fails, or
+        TimeoutError if the host doesn't answer within the fetcher's timeout.
+        """
+        entry = self._lookup(url)
+        if entry is not None and entry['expires'] > time.time():
+            self.counters['hits'] += 1
+            return entry['text']
+
+        inflight = self._inflight.get(url)
+        if inflight is None:
+            # The fetch runs as its own task, which every caller awaits through
+            # shield(): cancelling one caller never cancels the others' fetch
+            task = asyncio.ensure_future(self._refresh(fetcher, url, entry))
+            inflight = self._inflight[url] = {'task': task, 'waiters': 0}
+            task.add_done_callback(lambda _: self._forget_inflight(url, inflight))
+        else:
+            self.counters['coalesced'] += 1
+
+        inflight['waiters'] += 1
+        try:
+            return await asyncio.shield(inflight['task'])
+        finally:
+            inflight['waiters'] -= 1
+            if inflight['waiters'] == 0 and not inflight['task'].done():
+                # The last caller gave up (was cancelled): stop the fetch, and
+                # let the next caller start a new one rather than join this one
+                self._forget_inflight(url, inflight)
+                inflight['task'].cancel()
+
+    def _forget_inflight(self, url: str, inflight: dict):
+        if self._inflight.get(url) is inflight:
+            del self._inflight[url]
+
+    async def _refresh(self, fetcher: Fetcher, url: str, entry: dict | None) -> str:
+        """Fetch url, or serve the expired entry if the fetch fails and it may be served stale"""
+        try:
+            return await self._fetch(fetcher, url, entry)
+        except (httpx.HTTPError, TimeoutError) as e:
+            if not self._can_serve_stale(entry, e):
+                raise
+            self.counters['stale'] += 1
+            return entry['text']
+
+    def _can_serve_stale(self, entry: dict | None, error: Exception) -> bool:
+        """Whether entry may be served in place of error"""
+        if entry is None or time.time() - entry['expires'] > self.max_stale:
+            return False
+        return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+    async def _download(self, fetcher: Fetcher, url: str, headers: dict) -> tuple[httpx.Response, str | None, bool]:
+        """One request for url: (response, text, truncated), where text is None for a 304 or an error status"""
+        async with fetcher.stream(url, headers=headers) as response:
+            if response.status_code == 304 or response.is_error:
+                return response, None, False
+            text, truncated = await read_text(response, self.max_body_bytes)
+        return response, text, truncated
+
+    async def _fetch(self, fetcher: Fetcher, url: str, entry: dict | None) -> str:
+        """Fetch url (hedged, see Fetcher.hedged), revalidating entry if there is one"""
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response, text, truncated = await fetcher.hedged(url, lambda: self._download(fetcher, url, headers))
+        ttl = self._entry_ttl(response)
+        if response.status_code == 304 and entry is not None:
+            self.counters['revalidated'] += 1
+            if ttl is not None:
+                self._store(url, {**entry, 'expires': time.time() + ttl})
+            return entry['text']
+
+        response.raise_for_status()
+        self.counters['misses'] += 1
+        if truncated:
+            self.counters['truncated'] += 1
+        if ttl is not None:
+            self._store(url, {
+                'text': text,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'expires': time.time() + ttl,
+            })
+        return text
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and the current size of the cache"""
+        lookups = self.counters['hits'] + self.counters['misses'] + self.counters['revalidated']
+        return {
+            **self.counters,
+            'hit_rate': self.counters['hits'] / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
@@ -1,22 +1,57 @@
-from fastmcp import FastMCP
-import requests
-import urllib3
+import asyncio
+import os
+import time
+from typing import AsyncIterator
 
-# Disable SSL warnings for testing
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from fastmcp import Context, FastMCP
+import httpx
+
+import analyze
+import blobs
+import fetch
+import metrics
+import search
+
+# Jina Reader endpoint; point it at a local stand-in server for testing
+JINA_BASE_URL = os.environ.get("JINA_BASE_URL", "https://r.jina.ai/")
+
+# Shared connection pool for all scraping tools, with a circuit breaker per
+# host; set SCRAPE_HEDGE=1 to hedge requests that run longer than usual
+# (SSL verification disabled for testing, not recommended for production)
+fetcher = fetch.Fetcher(verify=False, hedge=os.environ.get("SCRAPE_HEDGE") == "1")
+
+# Cache of scraped pages; set SCRAPE_CACHE_DIR to keep it on disk between restarts
+page_cache = fetch.ResponseCache(disk_dir=os.environ.get("SCRAPE_CACHE_DIR"))
+
+# Large tool outputs kept on the server and passed around as content handles
+blob_store = blobs.BlobStore()
 
 mcp = FastMCP("Demo 🚀")
 
+# Per-tool call counts, latency, network time and payload sizes
+tool_metrics = metrics.MetricsMiddleware(collectors={
+    'page_cache': lambda: page_cache.stats(),
+    'blob_store': lambda: blob_store.stats(),
+    'fetcher': lambda: fetcher.stats(),
+})
+mcp.add_middleware(tool_metrics)
+
 @mcp.tool
 def add(a: int, b: int) -> int:
     """Add two numbers"""
     return a + b
 
-def scrape_web_impl(url: str) -> str:
+async def scrape_web_async(url: str) -> str:
     """Scrape the content of a web page and return it as markdown.
     
     Uses Jina Reader to convert web pages to markdown format.
     Simply prepend 'r.jina.ai/' to any URL to get its markdown content.
+    Pages are cached (see fetch.ResponseCache), so repeated calls for the
+    same URL are answered from memory; misses go through the shared
+    connection pool and skip the TCP+TLS handshake. Transient failures are
+    retried with jittered backoff within one deadline, and once r.jina.ai
+    keeps failing, calls fail fast (or get the last cached copy) instead of
+    waiting for the timeout.
     
     Args:
         url: The URL of the web page to scrape (e.g., 'https://datatalks.club')
@@ -24,31 +59,255 @@ def scrape_web_impl(url: str) -> str:
     Returns:
         The markdown content of the web page
     """
+    try:
+        return await fetch_page(url)
+    except (TimeoutError, httpx.HTTPError) as e:
+        return scrape_error(url, e)
+
+async def fetch_page(url: str) -> str:
+    """The markdown of url through the page cache, retrying transient failures.
+    
+    Each request is cut off after the fetcher's timeout, which counts
+    towards opening the host's circuit breaker (and serves the last cached
+    copy, if any), and no retry is started past that same deadline, so a
+    slow host costs no more than a single request would.
+    
+    Raises:
+        httpx.HTTPError if the page can't be fetched, TimeoutError if it timed out
+    """
     # Construct Jina Reader URL
-    jina_url = f"https://r.jina.ai/{url}"
+    jina_url = f"{JINA_BASE_URL}{url}"
+    return await fetch.retry(lambda: page_cache.get_text(fetcher, jina_url), deadline=fetcher.timeout)
+
+def scrape_error(url: str, error: Exception) -> str:
+    """The error message scraping tools return for url instead of its content (counted as a tool error)"""
+    metrics.record_error()
+    if isinstance(error, TimeoutError):
+        return f"Error scraping {url}: timed out after {fetcher.timeout}s"
+    # Some httpx errors (timeouts in particular) have an empty message
+    return f"Error scraping {url}: {str(error) or type(error).__name__}"
+
+def scrape_web_impl(url: str) -> str:
+    """Scrape the content of a web page and return it as markdown.
     
-    try:
-        # Disable SSL verification for testing (not recommended for production)
-        response = requests.get(jina_url, timeout=30, verify=False)
-        response.raise_for_status()
-        return response.text
-    except requests.exceptions.RequestException as e:
-        return f"Error scraping {url}: {str(e)}"
+    Blocking version of scrape_web_async for scripts; don't call it from
+    inside a running event loop.
+    
+    Args:
+        url: The URL of the web page to scrape (e.g., 'https://datatalks.club')
+    
+    Returns:
+        The markdown content of the web page
+    """
+    async def run():
+        try:
+            return await scrape_web_async(url)
+        finally:
+            # The pool belongs to this short-lived event loop
+            await fetcher.aclose()
+    return asyncio.run(run())
 
 @mcp.tool
-def scrape_web(url: str) -> str:
+async def scrape_web(url: str, as_handle: bool = False) -> str | dict:
     """Scrape the content of a web page and return it as markdown.
     
     Uses Jina Reader to convert web pages to markdown format.
     Simply prepend 'r.jina.ai/' to any URL to get its markdown content.
     
+    For large pages, pass as_handle=True to keep the content on the server
+    and get back a content handle instead. The handle can be given in place
+    of the text to count_word_in_text, count_terms_in_text and find_in_text,
+    and read piece by piece with read_content.
+    
     Args:
         url: The URL of the web page to scrape (e.g., 'https://datatalks.club')
+        as_handle: Return a content handle instead of the content (default: False)
     
     Returns:
-        The markdown content of the web page
+        The markdown content of the web page, or with as_handle
+        {'url', 'handle', 'length', 'preview'}
+    """
+    try:
+        text = await fetch_page(url)
+    except (TimeoutError, httpx.HTTPError) as e:
+        return scrape_error(url, e)
+    if not as_handle:
+        return text
+    return {'url': url, **blob_store.put(text)}
+
+@mcp.tool
+def read_content(handle: str, start: int = 0, length: int | None = None) -> dict:
+    """Read the content behind a content handle, or a range of it.
+    
+    Args:
+        handle: A content handle (e.g. from scrape_web with as_handle=True)
+        start: Offset of the first character to read (default: 0)
+        length: Number of characters to read (default: everything from start)
+    
+    Returns:
+        {'handle', 'start', 'end', 'length', 'text'}, where length is the
+        total length of the content
+    """
+    start = max(0, start)
+    end = None if length is None else start + max(0, length)
+    text = blob_store.read(handle, start, end)
+    return {
+        'handle': handle,
+        'start': start,
+        'end': start + len(text),
+        'length': blob_store.length(handle),
+        'text': text,
+    }
+
+@mcp.resource("blob://{blob_id}", mime_type="text/markdown")
+def blob_resource(blob_id: str) -> str:
+    """The content behind the content handle 'blob:<blob_id>'"""
+    return blob_store.read(f"{blobs.HANDLE_PREFIX}{blob_id}")
+
+async def scrape_page(url: str, timeout: float = fetch.TIMEOUT, retries: int = fetch.RETRIES) -> dict:
+    """Scrape one page for scrape_many, retrying transient failures.
+    
+    Args:
+        url: The URL of the web page to scrape
+        timeout: Seconds allowed per attempt
+        retries: How many times to retry timeouts, rate limits and server errors
+    
+    Returns:
+        {'url', 'content', 'error', 'attempts', 'seconds'}, where exactly one
+        of content and error is set
+    """
+    jina_url = f"{JINA_BASE_URL}{url}"
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        return await page_cache.get_text(fetcher, jina_url)
+
+    start = time.perf_counter()
+    content = error = None
+    try:
+        content = await fetch.retry(attempt, retries=retries, timeout=timeout)
+    except TimeoutError:
+        metrics.record_error()
+        error = f"Error scraping {url}: timed out after {timeout}s"
+    except httpx.HTTPError as e:
+        error = scrape_error(url, e)
+    return {
+        'url': url,
+        'content': content,
+        'error': error,
+        'attempts': attempts,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+async def iter_scrape_many(
+    urls: list[str],
+    max_concurrency: int = 5,
+    timeout: float = fetch.TIMEOUT,
+    retries: int = fetch.RETRIES,
+) -> AsyncIterator[tuple[int, dict]]:
+    """Scrape many pages concurrently, yielding (position in urls, result) as each one finishes.
+    
+    At most max_concurrency pages are in flight at once. A URL given more
+    than once is scraped once, and its result yielded for each position.
+    Pages still running when the iteration stops early are cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    positions = {}
+    for i, url in enumerate(urls):
+        positions.setdefault(url, []).append(i)
+
+    async def run(url: str) -> tuple[str, dict]:
+        async with semaphore:
+            return url, await scrape_page(url, timeout, retries)
+
+    tasks = [asyncio.create_task(run(url)) for url in positions]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            url, result = await next_done
+            for i in positions[url]:
+                yield i, dict(result)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@mcp.tool
+async def scrape_many(
+    urls: list[str],
+    max_concurrency: int = 5,
+    timeout: float = fetch.TIMEOUT,
+    retries: int = fetch.RETRIES,
+    ctx: Context | None = None,
+) -> list[dict]:
+    """Scrape many web pages concurrently and return them as markdown.
+    
+    Pages are fetched in parallel (up to max_concurrency at a time) through
+    the same cache and connection pool as scrape_web. Each page finishing
+    is reported right away as a progress notification and a log message,
+    so clients can follow along without waiting for the slowest page.
+    
+    Args:
+        urls: The URLs of the web pages to scrape
+        max_concurrency: How many pages to fetch at the same time (default: 5)
+        timeout: Seconds allowed per attempt (default: 30)
+        retries: How many times to retry timeouts, rate limits and server errors (default: 2)
+    
+    Returns:
+        One result per URL, in the order given: {'url', 'content', 'error',
+        'attempts', 'seconds'}, where exactly one of content and error is set
+    """
+    results = [None] * len(urls)
+    done = 0
+    async for i, result in iter_scrape_many(urls, max_concurrency, timeout, retries):
+        results[i] = result
+        done += 1
+        if ctx is not None:
+            await ctx.report_progress(done, len(urls), f"Scraped {result['url']}")
+            if result['error']:
+                await ctx.warning(result['error'])
+            else:
+                await ctx.info(f"Scraped {result['url']} ({len(result['content'])} characters, "
+                               f"{result['attempts']} attempt(s), {result['seconds']}s)")
+    return results
+
+@mcp.tool
+def scrape_cache_stats() -> dict:
+    """Report the hit/miss/eviction counters and size of the scrape_web page cache.
+    
+    Returns:
+        Counters (hits, disk_hits, misses, revalidated, coalesced, evictions, truncated),
+        the hit rate, and the number of entries and bytes cached
+    """
+    return page_cache.stats()
+
+@mcp.tool
+def server_metrics(format: str = "json") -> dict | str:
+    """Report per-tool metrics: calls, errors, latency, network time and bytes in/out.
+    
+    Args:
+        format: 'json' for a dict, 'prometheus' for the Prometheus text format (default: 'json')
+    
+    Returns:
+        Per-tool call counts, throughput, latency percentiles (upper bounds of
+        histogram buckets), network vs processing seconds and payload sizes,
+        plus the page cache and blob store counters
     """
-    return scrape_web_impl(url)
+    if format == "prometheus":
+        return tool_metrics.to_prometheus()
+    if format != "json":
+        raise ValueError(f"Unknown format {format!r}, expected 'json' or 'prometheus'")
+    return tool_metrics.snapshot()
+
+@mcp.resource("metrics://tools", mime_type="application/json")
+def metrics_resource() -> dict:
+    """Per-tool metrics of this server (see server_metrics)"""
+    return tool_metrics.snapshot()
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain")
+def metrics_prometheus_resource() -> str:
+    """Per-tool metrics of this server in the Prometheus text format"""
+    return tool_metrics.to_prometheus()
 
 @mcp.tool
 def count_word_in_text(text: str, word: str) -> int:
@@ -57,16 +316,174 @@ def count_word_in_text(text: str, word: str) -> int:
     Useful for counting word occurrences in scraped web content.
     
     Args:
-        text: The text to search in
+        text: The text to search in, or a content handle
         word: The word to count
     
     Returns:
         The number of times the word appears in the text
     """
+    text = blob_store.resolve(text)
     text_lower = text.lower()
     word_lower = word.lower()
     return text_lower.count(word_lower)
 
+@mcp.tool
+def count_terms_in_text(text: str, terms: list[str], mode: str = "word") -> dict[str, int]:
+    """Count how many times each of several terms appears in a text (case-insensitive).
+    
+    All terms are counted in one go, which is much faster than calling
+    count_word_in_text once per term.
+    
+    Args:
+        text: The text to search in, or a content handle
+        terms: The terms to count; in word mode a term can be a phrase (e.g. 'machine learning')
+        mode: 'word' counts whole words only ('data' does not match 'metadata'),
+              'substring' counts every occurrence like count_word_in_text (default: 'word')
+    
+    Returns:
+        The number of times each term appears in the text
+    """
+    return analyze.count_terms(blob_store.resolve(text), terms, mode)
+
+@mcp.tool
+def find_in_text(text: str, term: str, context: int = 50, max_snippets: int = 5) -> dict:
+    """Find a term in a text and show where it appears (case-insensitive).
+    
+    Args:
+        text: The text to search in, or a content handle
+        term: The term to look for
+        context: Characters of context on each side of a snippet (default: 50)
+        max_snippets: Number of snippets to return (default: 5)
+    
+    Returns:
+        {'count', 'snippets'}: the number of (non-overlapping) occurrences
+        and the first max_snippets of them in context
+    """
+    text = blob_store.resolve(text)
+    return {
+        'count': analyze.count_terms(text, [term], mode="substring")[term],
+        'snippets': analyze.find_snippets(text, term, context, max_snippets),
+    }
+
+@mcp.tool
+async def count_word_in_page(url: str, word: str) -> dict:
+    """Count how many times a word appears on a web page (case-insensitive).
+    
+    The page is streamed and counted piece by piece, so even very large
+    pages are never held in memory as a whole. Counting stops at the
+    size limit for page bodies.
+    
+    Args:
+        url: The URL of the web page to scrape (e.g., 'https://datatalks.club')
+        word: The word to count
+    
+    Returns:
+        {'url', 'word', 'count', 'truncated'}, or {'url', 'word', 'error'}
+        if the page could not be fetched
+    """
+    counter = analyze.SubstringCounter([word])
+    try:
+        truncated = await fetch.stream_text(fetcher, f"{JINA_BASE_URL}{url}", counter)
+    except httpx.HTTPError as e:
+        return {'url': url, 'word': word, 'error': scrape_error(url, e)}
+    return {'url': url, 'word': word, 'count': counter.counts()[word], 'truncated': truncated}
+
+@mcp.tool
+async def analyze_page(
+    url: str,
+    terms: list[str] | None = None,
+    mode: str = "word",
+    snippet_terms: list[str] | None = None,
+    context: int = 50,
+    max_snippets: int = 5,
+    patterns: list[str] | None = None,
+) -> dict:
+    """Scrape a web page and analyze it on the server, returning only the results.
+    
+    Use this instead of scrape_web followed by count_word_in_text: the page
+    text never has to be sent to the client and back. The page comes from
+    the same cache as scrape_web.
+    
+    Args:
+        url: The URL of the web page to analyze (e.g., 'https://datatalks.club')
+        terms: Terms to count (see count_terms_in_text)
+        mode: 'word' or 'substring' counting for terms (default: 'word')
+        snippet_terms: Terms to show in context, e.g. ['data']
+        context: Characters of context on each side of a snippet (default: 50)
+        max_snippets: Snippets (and regex matches) to return per term or pattern (default: 5)
+        patterns: Regular expressions to count and show matches of (case-insensitive)
+    
+    Returns:
+        {'url', 'characters', 'counts', 'snippets', 'regex'}, or {'url', 'error'}
+        if the page could not be fetched
+    """
+    try:
+        text = await fetch_page(url)
+    except (TimeoutError, httpx.HTTPError) as e:
+        return {'url': url, 'error': scrape_error(url, e)}
+    # Large pages take a while to analyze, so keep it off the event loop
+    result = await asyncio.to_thread(
+        analyze.analyze_text, text, terms, mode, snippet_terms, context, max_snippets, patterns
+    )
+    return {'url': url, **result}
+
+# Shared fastmcp docs index: loaded on the first search, then reused and
+# refreshed in the background when the docs archive changes
+docs_index = search.SharedIndex(search.ZIP_FILENAME, search.SNAPSHOT_DIR)
+
+def search_docs_impl(
+    query: str,
+    num_results: int = 5,
+    filename: str | None = None,
+    prefix: str | None = None,
+    extension: str | None = None,
+) -> list[dict]:
+    """Search the fastmcp documentation and return the best matching passages.
+    
+    Args:
+        query: Search query string
+        num_results: Number of results to return (default: 5)
+        filename: Only search this exact file
+        prefix: Only search files under this path prefix
+        extension: Only search files with this extension
+    
+    Returns:
+        List of passages (content, filename, heading) ranked by relevance,
+        at most one per file
+    """
+    index = docs_index.get()
+    if index is None:
+        return []
+    return search.search_docs(
+        index, query, num_results=num_results, filename=filename, prefix=prefix, extension=extension
+    )
+
+@mcp.tool
+async def search_docs(
+    query: str,
+    num_results: int = 5,
+    filename: str | None = None,
+    prefix: str | None = None,
+    extension: str | None = None,
+) -> list[dict]:
+    """Search the fastmcp documentation and return the best matching passages.
+    
+    The index is loaded once and shared between calls, so a search only
+    costs the lookup.
+    
+    Args:
+        query: Search query string (e.g. 'demo')
+        num_results: Number of results to return (default: 5)
+        filename: Only search this exact file (e.g. 'docs/servers/tools.mdx')
+        prefix: Only search files under this path prefix (e.g. 'docs/servers/')
+        extension: Only search files with this extension (e.g. '.mdx')
+    
+    Returns:
+        List of passages (content, filename, heading) ranked by relevance,
+        at most one per file
+    """
+    # The first call may have to load or build the index, so keep it off the event loop
+    return await asyncio.to_thread(search_docs_impl, query, num_results, filename, prefix, extension)
+
 if __name__ == "__main__":
-    mcp.run()Count how many times the word "data" appears on https://datatalks.club/
-Use available MCP tools for that
\ No newline at end of file
+    mcp.run()
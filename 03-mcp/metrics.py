@@ -0,0 +1,188 @@
+"""Per-tool latency, throughput and payload metrics for the MCP server, as JSON or Prometheus text"""
+
+import json
+import time
+from contextvars import ContextVar
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Seconds spent waiting on the network during the current tool call,
+# added to by fetch.Fetcher (a one-element list, shared with sub-tasks)
+network_time: ContextVar[list[float] | None] = ContextVar('network_time', default=None)
+
+
+# Errors the current tool call returned rather than raised (e.g. an error
+# message in place of a page), counted by record_error (a one-element list)
+returned_errors: ContextVar[list[int] | None] = ContextVar('returned_errors', default=None)
+
+
+def add_network_time(seconds: float):
+    """Count seconds of network time towards the current tool call, if it is being measured."""
+    timer = network_time.get()
+    if timer is not None:
+        timer[0] += seconds
+
+
+def record_error():
+    """Count the current tool call as an error even though it returns, if it is being measured."""
+    errors = returned_errors.get()
+    if errors is not None:
+        errors[0] += 1
+
+
+class ToolStats:
+    """Counters and a latency histogram for one tool"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.network_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one is +Inf
+
+    def observe(self, seconds: float, network_seconds: float, bytes_in: int, bytes_out: int, error: bool):
+        self.calls += 1
+        self.errors += error
+        self.seconds += seconds
+        self.network_seconds += network_seconds
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the histogram bucket holding the q-th quantile (None above the last bound)"""
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self, uptime: float) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'calls_per_second': round(self.calls / uptime, 3) if uptime else 0.0,
+            'mean_ms': ms(self.seconds / self.calls) if self.calls else None,
+            'p50_ms': ms(self.quantile(0.5)),
+            'p95_ms': ms(self.quantile(0.95)),
+            'p99_ms': ms(self.quantile(0.99)),
+            'network_seconds': round(self.network_seconds, 6),
+            'processing_seconds': round(max(0.0, self.seconds - self.network_seconds), 6),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+def result_size(result) -> int:
+    """Bytes of text in a tool result's content blocks"""
+    return sum(len(getattr(block, 'text', '').encode('utf-8')) for block in result.content)
+
+
+class MetricsMiddleware(Middleware):
+    """
+    FastMCP middleware that times every tool call.
+
+    Per tool it counts calls and errors, keeps a latency histogram, and adds
+    up the bytes of the arguments and results and the time spent waiting on
+    the network (see add_network_time). A call is an error if it raises, or
+    if it reports a failure in its result (see record_error), like a scrape
+    returning an error message. Other components (caches, stores) can be
+    registered as collectors: callables returning a dict of numbers, which
+    are reported alongside the tool metrics.
+    """
+
+    def __init__(self, collectors: dict | None = None):
+        self.tools = {}
+        self.collectors = dict(collectors or {})
+        self.started = time.monotonic()
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        name = context.message.name
+        bytes_in = len(json.dumps(context.message.arguments or {}, default=str).encode('utf-8'))
+        timer = [0.0]
+        errors = [0]
+        token = network_time.set(timer)
+        errors_token = returned_errors.set(errors)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = await call_next(context)
+            return result
+        finally:
+            network_time.reset(token)
+            returned_errors.reset(errors_token)
+            stats = self.tools.setdefault(name, ToolStats())
+            stats.observe(
+                time.perf_counter() - start,
+                timer[0],
+                bytes_in,
+                result_size(result) if result is not None else 0,
+                error=result is None or errors[0] > 0,
+            )
+
+    def snapshot(self) -> dict:
+        """All metrics as a dict: {'uptime_seconds', 'tools': {name: ...}, <collector>: {...}}"""
+        uptime = time.monotonic() - self.started
+        report = {
+            'uptime_seconds': round(uptime, 3),
+            'tools': {name: stats.snapshot(uptime) for name, stats in sorted(self.tools.items())},
+        }
+        for name, collect in self.collectors.items():
+            report[name] = collect()
+        return report
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        tools = sorted(self.tools.items())
+        counters = [
+            ('mcp_tool_calls_total', 'Tool calls', lambda stats: stats.calls),
+            ('mcp_tool_errors_total', 'Tool calls that raised or returned an error', lambda stats: stats.errors),
+            ('mcp_tool_network_seconds_total', 'Seconds tool calls spent waiting on the network',
+             lambda stats: stats.network_seconds),
+            ('mcp_tool_request_bytes_total', 'Bytes of tool call arguments', lambda stats: stats.bytes_in),
+            ('mcp_tool_response_bytes_total', 'Bytes of tool results', lambda stats: stats.bytes_out),
+        ]
+        for metric, help_text, value in counters:
+            family(metric, 'counter', help_text)
+            for name, stats in tools:
+                lines.append(f'{metric}{{tool="{name}"}} {value(stats)}')
+
+        family('mcp_tool_duration_seconds', 'histogram', 'Tool call latency')
+        for name, stats in tools:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'mcp_tool_duration_seconds_bucket{{tool="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'mcp_tool_duration_seconds_bucket{{tool="{name}",le="+Inf"}} {stats.calls}')
+            lines.append(f'mcp_tool_duration_seconds_sum{{tool="{name}"}} {stats.seconds}')
+            lines.append(f'mcp_tool_duration_seconds_count{{tool="{name}"}} {stats.calls}')
+
+        for collector, collect in self.collectors.items():
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"mcp_{collector}_{key}"
+                    family(metric, 'gauge', f"{collector} {key}")
+                    lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
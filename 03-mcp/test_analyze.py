@@ -0,0 +1,63 @@
+"""Test script for the text analytics used by the scraping tools"""
+
+import re
+
+from analyze import SubstringCounter, WordCounter, count_terms, term_counter
+
+TEXT = (
+    "Data, data everywhere; metadata is DATA too. aaaa\n"
+    "Machine learning needs data. machine\nlearning, MACHINE-learning! data_science is not data."
+)
+
+
+def feed(counter, text: str, size: int):
+    """Feed text to a streaming counter in pieces of size characters"""
+    for start in range(0, len(text), size):
+        counter(text[start:start + size])
+    return counter.counts()
+
+
+def test_substring_counts_match_str_count():
+    """Substring mode should count like text.lower().count(term.lower()), however the text is split"""
+    terms = ["data", "DATA", "aa", "a", "everywhere;", "missing", ""]
+    expected = {term: TEXT.lower().count(term.lower()) if term else 0 for term in terms}
+    assert count_terms(TEXT, terms, mode="substring") == expected
+    for size in [1, 2, 3, 7, len(TEXT)]:
+        assert feed(SubstringCounter(terms), TEXT, size) == expected, size
+
+
+def test_word_counts_and_phrases():
+    """Word mode should count whole words and phrases, however the text is split"""
+    terms = ["data", "machine learning", "learning needs data", "meta", "data_science", "missing", "..."]
+    expected = {
+        "data": 5,
+        "machine learning": 3,
+        "learning needs data": 1,
+        "meta": 0,
+        "data_science": 1,
+        "missing": 0,
+        "...": 0,
+    }
+    assert count_terms(TEXT, terms) == expected
+    for size in [1, 2, 5, 13, len(TEXT)]:
+        assert feed(WordCounter(terms), TEXT, size) == expected, size
+
+    words = re.findall(r'\w+', TEXT.lower())
+    assert count_terms(TEXT, ["data"])["data"] == words.count("data")
+
+
+def test_unknown_mode():
+    """An unknown mode should be rejected"""
+    try:
+        term_counter(["data"], mode="fuzzy")
+    except ValueError as e:
+        assert "fuzzy" in str(e)
+    else:
+        raise AssertionError("expected a ValueError")
+
+
+if __name__ == "__main__":
+    test_substring_counts_match_str_count()
+    test_word_counts_and_phrases()
+    test_unknown_mode()
+    print("All analyze tests passed")
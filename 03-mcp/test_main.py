@@ -0,0 +1,665 @@
+"""Test script for the MCP server tools (runs offline, using an in-memory client)"""
+
+import asyncio
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+from fastmcp import Client
+
+import analyze
+import blobs
+import fetch
+import main
+import search
+from test_search import CORPUS, write_zip
+
+
+def call_tool(name: str, arguments: dict):
+    """Call a tool on the MCP server through an in-memory client"""
+    async def run():
+        async with Client(main.mcp) as client:
+            return await client.call_tool(name, arguments)
+    return asyncio.run(run())
+
+
+BIG_PAGE = "Données et DATA: des données partout. " * 20000
+
+
+class JinaStandIn(BaseHTTPRequestHandler):
+    """
+    Local stand-in for r.jina.ai: answers GET /<url> with markdown about that
+    url, with an ETag, and 304 Not Modified when If-None-Match matches it.
+    URLs ending in /missing get a 404, /flaky a 503 on the first request
+    and /slow take an extra second (/spiky only the first time); /big is a
+    large page sent in small pieces. While server.down is set, every
+    request gets a 503.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep connections alive
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            url = self.path[1:]
+            spike = url.endswith("/slow")
+            if url.endswith("/spiky"):
+                with self.server.lock:
+                    self.server.spiky_seen += 1
+                    spike = self.server.spiky_seen == 1
+            time.sleep(self.delay + (1.0 if spike else 0.0))
+            etag = f'"{len(url)}-{sum(map(ord, url))}"'
+            with self.server.lock:
+                self.server.requests += 1
+            if self.server.down:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etag:
+                with self.server.lock:
+                    self.server.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            status = 404 if url.endswith("/missing") else 200
+            if url.endswith("/big"):
+                self.send_big_page()
+                return
+            if url.endswith("/flaky"):
+                with self.server.lock:
+                    self.server.flaky_seen += 1
+                    status = 503 if self.server.flaky_seen == 1 else 200
+            body = f"# Page\n\nMarkdown for {url}".encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "text/markdown; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def send_big_page(self):
+        body = BIG_PAGE.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/markdown; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        # Odd-sized pieces, so multi-byte characters and words get split between them
+        for start in range(0, len(body), 1001):
+            self.wfile.write(body[start:start + 1001])
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def jina_stand_in(delay: float = 0.0):
+    """Serve JinaStandIn on a free local port and point main.JINA_BASE_URL at it (with an empty page cache and a fresh fetcher)"""
+    handler = type("Handler", (JinaStandIn,), {'delay': delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.lock = threading.Lock()
+    server.connections = server.active = server.max_active = server.requests = server.not_modified = server.flaky_seen = server.spiky_seen = 0
+    server.down = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url, page_cache, fetcher = main.JINA_BASE_URL, main.page_cache, main.fetcher
+    main.JINA_BASE_URL = f"http://127.0.0.1:{server.server_port}/"
+    main.page_cache = fetch.ResponseCache()
+    main.fetcher = fetch.Fetcher()
+    try:
+        yield server
+    finally:
+        main.JINA_BASE_URL, main.page_cache, main.fetcher = base_url, page_cache, fetcher
+        server.shutdown()
+        server.server_close()
+
+
+def test_scrape_web_reuses_connections():
+    """Sequential scrapes should go through one pooled keep-alive connection"""
+    with jina_stand_in() as server:
+        async def run():
+            try:
+                return [await main.scrape_web_async(f"https://example.com/{i}") for i in range(5)]
+            finally:
+                await main.fetcher.aclose()
+        pages = asyncio.run(run())
+
+        assert pages[3] == "# Page\n\nMarkdown for https://example.com/3"
+        assert server.connections == 1
+
+        assert main.scrape_web_impl("https://example.com/sync").endswith("https://example.com/sync")
+        assert main.scrape_web_impl("https://example.com/missing").startswith(
+            "Error scraping https://example.com/missing: Client error '404"
+        )
+
+
+def test_scrape_web_tool_runs_concurrently():
+    """Concurrent scrape_web calls should overlap, up to the per-host limit"""
+    with jina_stand_in(delay=0.3) as server:
+        async def run():
+            try:
+                async with Client(main.mcp) as client:
+                    return await asyncio.gather(*(
+                        client.call_tool("scrape_web", {"url": f"https://example.com/{i}"}) for i in range(12)
+                    ))
+            finally:
+                await main.fetcher.aclose()
+
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        assert [result.data for result in results] == [
+            f"# Page\n\nMarkdown for https://example.com/{i}" for i in range(12)
+        ]
+        # 12 calls with at most PER_HOST_LIMIT (8) at a time: two rounds, not twelve
+        assert server.max_active == main.fetcher.per_host_limit
+        assert elapsed < 12 * 0.3 / 2
+
+
+def test_scrape_web_cache():
+    """Repeat scrapes should come from the cache, coalesced, revalidated with ETags, and persisted to disk"""
+    url = "https://datatalks.club"
+    with jina_stand_in(delay=0.2) as server, tempfile.TemporaryDirectory() as tmp:
+        main.page_cache = fetch.ResponseCache(disk_dir=tmp)
+
+        async def run():
+            try:
+                pages = await asyncio.gather(*(main.scrape_web_async(url) for _ in range(5)))
+                assert server.requests == 1
+                assert main.page_cache.stats()['coalesced'] == 4
+
+                start = time.perf_counter()
+                assert await main.scrape_web_async(url) == pages[0]
+                assert time.perf_counter() - start < 0.01
+                assert server.requests == 1
+
+                # Once expired, the entry is revalidated instead of downloaded again
+                next(iter(main.page_cache._entries.values()))['expires'] = 0
+                assert await main.scrape_web_async(url) == pages[0]
+                assert (server.requests, server.not_modified) == (2, 1)
+
+                # A fresh cache on the same directory starts warm
+                main.page_cache = fetch.ResponseCache(disk_dir=tmp)
+                assert await main.scrape_web_async(url) == pages[0]
+                assert server.requests == 2
+
+                main.page_cache = fetch.ResponseCache(max_entries=2)
+                for i in range(3):
+                    await main.scrape_web_async(f"{url}/{i}")
+                await main.scrape_web_async(f"{url}/missing")
+            finally:
+                await main.fetcher.aclose()
+        asyncio.run(run())
+
+        stats = call_tool("scrape_cache_stats", {}).data
+        assert stats['misses'] == 3
+        assert stats['evictions'] == 1
+        assert stats['entries'] == 2
+
+
+def test_cancelling_one_caller_keeps_the_shared_fetch():
+    """Cancelling the caller that started a fetch should not cancel the callers that joined it"""
+    url = "https://example.com/shared"
+    with jina_stand_in(delay=0.2) as server:
+        async def run():
+            try:
+                jina_url = f"{main.JINA_BASE_URL}{url}"
+                owner = asyncio.create_task(main.page_cache.get_text(main.fetcher, jina_url))
+                await asyncio.sleep(0.05)
+                waiter = asyncio.create_task(main.page_cache.get_text(main.fetcher, jina_url))
+                await asyncio.sleep(0.05)
+                owner.cancel()
+                text = await waiter
+                assert owner.cancelled() and not waiter.cancelled()
+                assert server.requests == 1
+
+                # When every caller gives up, the fetch is stopped and the next one starts afresh
+                lone = asyncio.create_task(main.page_cache.get_text(main.fetcher, f"{jina_url}/2"))
+                await asyncio.sleep(0.05)
+                lone.cancel()
+                await asyncio.sleep(0)
+                assert main.page_cache._inflight == {}
+                return text
+            finally:
+                await main.fetcher.aclose()
+        text = asyncio.run(run())
+
+        assert text.endswith(url)
+        assert main.page_cache.stats()['coalesced'] == 1
+
+def test_scrape_many_tool():
+    """scrape_many should report pages as they finish, retry transient errors and time out slow pages"""
+    urls = [f"https://example.com/{i}" for i in range(6)] + [
+        "https://example.com/slow", "https://example.com/flaky", "https://example.com/missing",
+    ]
+    with jina_stand_in(delay=0.1) as server:
+        logs = []
+        progress = []
+
+        async def log_handler(message):
+            logs.append(message.data['msg'])
+
+        async def progress_handler(done, total, message):
+            progress.append((done, total, message))
+
+        async def run():
+            try:
+                async with Client(main.mcp, log_handler=log_handler, progress_handler=progress_handler) as client:
+                    return await client.call_tool("scrape_many", {"urls": urls, "max_concurrency": 4, "timeout": 0.5})
+            finally:
+                await main.fetcher.aclose()
+
+        start = time.perf_counter()
+        results = asyncio.run(run()).structured_content['result']
+        elapsed = time.perf_counter() - start
+
+    assert [result['url'] for result in results] == urls
+    assert results[0]['content'] == "# Page\n\nMarkdown for https://example.com/0"
+    assert results[7]['content'].endswith("https://example.com/flaky")
+    assert results[7]['attempts'] == 2
+    assert results[8]['error'].startswith("Error scraping https://example.com/missing: Client error '404")
+    assert results[8]['attempts'] == 1
+    assert results[6]['error'] == "Error scraping https://example.com/slow: timed out after 0.5s"
+    assert results[6]['attempts'] == 3
+
+    # Progress is reported per page as it finishes: the slow page comes last
+    assert [done for done, _, _ in progress] == list(range(1, len(urls) + 1))
+    assert progress[-1][2] == "Scraped https://example.com/slow"
+    assert len(logs) == len(urls)
+    assert elapsed < 5
+
+
+def test_scrape_many_duplicate_urls():
+    """A URL given twice should be scraped once, and a timeout on it reported in both rows"""
+    with jina_stand_in() as server:
+        async def run():
+            try:
+                slow = await main.scrape_many.fn(["https://example.com/slow"] * 2, timeout=0.3, retries=0)
+                pages = await main.scrape_many.fn(["https://example.com/a", "https://example.com/b",
+                                                   "https://example.com/a"])
+                return slow, pages
+            finally:
+                await main.fetcher.aclose()
+        slow, pages = asyncio.run(run())
+        assert server.requests <= 3
+
+    assert [result['error'] for result in slow] == ["Error scraping https://example.com/slow: timed out after 0.3s"] * 2
+    assert [result['url'] for result in pages] == ["https://example.com/a", "https://example.com/b", "https://example.com/a"]
+    assert pages[0]['content'] == pages[2]['content'] == "# Page\n\nMarkdown for https://example.com/a"
+    assert pages[0] is not pages[2]
+
+def test_large_pages_are_streamed_and_capped():
+    """Large bodies should be decoded incrementally, capped with a marker, or counted without being kept"""
+    url = "https://example.com/big"
+    with jina_stand_in() as server:
+        main.page_cache = fetch.ResponseCache(max_body_bytes=10_000)
+
+        async def run():
+            try:
+                page = await main.scrape_web_async(url)
+                counted = await main.count_word_in_page.fn(url, "données")
+                uncapped = fetch.ResponseCache()
+                full = await uncapped.get_text(main.fetcher, f"{main.JINA_BASE_URL}{url}")
+                # The marker is only added to text, never passed to a sink
+                marker_words = analyze.SubstringCounter(["truncated", "bytes"])
+                cut = await fetch.stream_text(main.fetcher, f"{main.JINA_BASE_URL}{url}", marker_words, max_bytes=20)
+                return page, counted, full, (cut, marker_words.counts())
+            finally:
+                await main.fetcher.aclose()
+        page, counted, full, sunk = asyncio.run(run())
+        assert main.page_cache.stats()['truncated'] == 1
+
+    marker = fetch.TRUNCATION_MARKER.format(max_bytes=10_000)
+    assert page.endswith(marker)
+    assert BIG_PAGE.startswith(page[:-len(marker)])
+    assert len(page[:-len(marker)].encode('utf-8')) > 10_000 - 4
+
+    assert full == BIG_PAGE
+    assert counted == {'url': url, 'word': "données", 'count': 40000, 'truncated': False}
+    assert sunk == (True, {"truncated": 0, "bytes": 0})
+
+
+def test_count_terms_in_text_tool():
+    """count_terms_in_text should count all terms in one call, as words or substrings"""
+    text = "Data engineering: data pipelines, metadata and DATA quality. Machine learning on data."
+    result = call_tool("count_terms_in_text", {"text": text, "terms": ["data", "machine learning", "pipeline"]})
+    assert result.structured_content == {"data": 4, "machine learning": 1, "pipeline": 0}
+
+    result = call_tool("count_terms_in_text", {"text": text, "terms": ["data", "pipeline"], "mode": "substring"})
+    assert result.structured_content == {"data": 5, "pipeline": 1}
+    assert result.structured_content["data"] == main.count_word_in_text.fn(text, "data")
+
+
+def test_analyze_page_tool():
+    """analyze_page should fetch (through the cache) and return only counts, snippets and regex hits"""
+    url = "https://example.com/big"
+    with jina_stand_in() as server:
+        async def run():
+            try:
+                async with Client(main.mcp) as client:
+                    arguments = {
+                        "url": url,
+                        "terms": ["données", "data"],
+                        "snippet_terms": ["DATA"],
+                        "max_snippets": 2,
+                        "context": 10,
+                        "patterns": [r"des \w+", "("],
+                    }
+                    invalid = await client.call_tool("analyze_page", arguments, raise_on_error=False)
+                    arguments["patterns"] = [r"des \w+"]
+                    first = await client.call_tool("analyze_page", arguments)
+                    second = await client.call_tool("analyze_page", {"url": url, "terms": ["partout"]})
+                    missing = await client.call_tool("analyze_page", {"url": "https://example.com/missing"})
+                    return invalid, first, second, missing
+            finally:
+                await main.fetcher.aclose()
+        invalid, first, second, missing = asyncio.run(run())
+        assert server.requests == 2  # the page is fetched once, then served from the cache
+
+    assert invalid.is_error and "Invalid pattern '('" in invalid.content[0].text
+    assert first.structured_content == {
+        'url': url,
+        'characters': len(BIG_PAGE),
+        'counts': {'données': 40000, 'data': 20000},
+        'snippets': {'DATA': ["onnées et DATA: des donn", "onnées et DATA: des donn"]},
+        'regex': {r"des \w+": {'count': 20000, 'matches': ["des données", "des données"]}},
+    }
+    assert second.structured_content['counts'] == {'partout': 20000}
+    assert missing.structured_content['error'].startswith("Error scraping https://example.com/missing")
+
+
+def test_content_handles():
+    """scrape_web can return a handle that other tools accept in place of the text, with ranged reads"""
+    url = "https://example.com/big"
+    with jina_stand_in():
+        async def run():
+            try:
+                async with Client(main.mcp) as client:
+                    handle = (await client.call_tool("scrape_web", {"url": url, "as_handle": True})).data
+                    h = handle['handle']
+                    return handle, {
+                        'count': (await client.call_tool("count_word_in_text", {"text": h, "word": "data"})).data,
+                        'terms': (await client.call_tool("count_terms_in_text", {"text": h, "terms": ["partout"]})).data,
+                        'find': (await client.call_tool("find_in_text", {"text": h, "term": "PARTOUT", "max_snippets": 1, "context": 5})).data,
+                        'range': (await client.call_tool("read_content", {"handle": h, "start": 11, "length": 4})).structured_content,
+                        'resource': (await client.read_resource(f"blob://{h[len('blob:'):]}"))[0].text,
+                        'evicted': await client.call_tool("read_content", {"handle": "blob:" + "0" * 16}, raise_on_error=False),
+                    }
+            finally:
+                await main.fetcher.aclose()
+        handle, results = asyncio.run(run())
+
+    assert handle['url'] == url
+    assert handle['length'] == len(BIG_PAGE)
+    assert handle['preview'] == BIG_PAGE[:200]
+    assert results['count'] == 20000
+    assert results['terms'] == {"partout": 20000}
+    assert results['find'] == {'count': 20000, 'snippets': ["nées partout. Don"]}
+    assert results['range'] == {'handle': handle['handle'], 'start': 11, 'end': 15, 'length': len(BIG_PAGE), 'text': "DATA"}
+    assert results['resource'] == BIG_PAGE
+    assert results['evicted'].is_error and "may have been evicted" in results['evicted'].content[0].text
+
+    # Text that merely looks like something else is left alone
+    assert main.count_word_in_text.fn("blob: data", "data") == 1
+
+
+def test_blob_store_eviction():
+    """The blob store should deduplicate by content and evict the least recently used blobs"""
+    store = blobs.BlobStore(max_count=2)
+    first = store.put("first page")
+    assert store.put("first page") == first
+    second = store.put("second page")
+    store.read(first['handle'])
+    store.put("third page")
+
+    assert store.read(first['handle'], 0, 5) == "first"
+    try:
+        store.read(second['handle'])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected the least recently used blob to be evicted")
+    assert store.stats() == {'puts': 4, 'reads': 2, 'evictions': 1, 'blobs': 2, 'bytes': len("first page third page") - 1}
+
+
+def test_server_metrics():
+    """Tool calls should be counted and timed, with network time, payload sizes and errors"""
+    main.tool_metrics.tools.clear()
+    with jina_stand_in(delay=0.05):
+        async def run():
+            try:
+                async with Client(main.mcp) as client:
+                    for i in range(3):
+                        await client.call_tool("add", {"a": i, "b": 1})
+                    await client.call_tool("scrape_web", {"url": "https://example.com/metrics"})
+                    await client.call_tool("scrape_web", {"url": "https://example.com/metrics"})
+                    # Returns an error message rather than raising
+                    await client.call_tool("count_word_in_page", {"url": "https://example.com/missing", "word": "page"})
+                    await client.call_tool("read_content",{"handle": "blob:" + "0" * 16}, raise_on_error=False)
+                    report = (await client.call_tool("server_metrics", {})).structured_content["result"]
+                    prometheus = (await client.read_resource("metrics://prometheus"))[0].text
+                    return report, prometheus
+            finally:
+                await main.fetcher.aclose()
+        report, prometheus = asyncio.run(run())
+
+    tools = report['tools']
+    assert tools['add']['calls'] == 3
+    assert tools['add']['errors'] == 0
+    assert tools['add']['network_seconds'] == 0
+    assert tools['add']['bytes_in'] == len('{"a": 0, "b": 1}') * 3
+
+    scrape = tools['scrape_web']
+    assert scrape['calls'] == 2
+    assert 0.05 <= scrape['network_seconds'] <= scrape['mean_ms'] * 2 / 1000
+    assert scrape['bytes_out'] == 2 * len("# Page\n\nMarkdown for https://example.com/metrics")
+    assert scrape['errors'] == 0
+    assert tools['count_word_in_page']['calls'] == tools['count_word_in_page']['errors'] == 1
+    assert tools['read_content']['errors'] == 1
+    assert report['page_cache']['hits'] == 1
+
+    assert 'mcp_tool_calls_total{tool="add"} 3' in prometheus
+    assert 'mcp_tool_duration_seconds_bucket{tool="add",le="+Inf"} 3' in prometheus
+    assert 'mcp_tool_errors_total{tool="read_content"} 1' in prometheus
+    assert 'mcp_tool_errors_total{tool="count_word_in_page"} 1' in prometheus
+    assert "# TYPE mcp_page_cache_hits gauge" in prometheus
+
+
+def test_circuit_breaker_fails_fast_and_serves_stale():
+    """Once the host keeps failing, scrapes should fail fast, or get the last cached copy"""
+    with jina_stand_in() as server:
+        main.fetcher = fetch.Fetcher(failure_threshold=3, reset_timeout=0.5)
+
+        async def run():
+            try:
+                cached = await main.scrape_web_async("https://example.com/cached")
+                next(iter(main.page_cache._entries.values()))['expires'] = time.time() - 1
+
+                server.down = True
+                errors = [await main.scrape_web_async(f"https://example.com/{i}") for i in range(2)]
+                requests_when_open = server.requests
+
+                start = time.perf_counter()
+                fast_error = await main.scrape_web_async("https://example.com/new")
+                fast_seconds = time.perf_counter() - start
+                stale = await main.scrape_web_async("https://example.com/cached")
+                assert server.requests == requests_when_open
+
+                # After the reset timeout a trial request goes through and closes the breaker
+                server.down = False
+                await asyncio.sleep(0.5)
+                recovered = await main.scrape_web_async("https://example.com/new")
+                return cached, errors, fast_error, fast_seconds, stale, recovered
+            finally:
+                await main.fetcher.aclose()
+        cached, errors, fast_error, fast_seconds, stale, recovered = asyncio.run(run())
+
+        breaker = main.fetcher.breaker("127.0.0.1")
+        assert breaker.state == "closed"
+        assert breaker.rejected >= 2
+        assert main.page_cache.stats()['stale'] == 1
+
+    assert all("503 Service Unavailable" in error or "Circuit open" in error for error in errors)
+    assert fast_error.startswith("Error scraping https://example.com/new: Circuit open for 127.0.0.1")
+    assert fast_seconds < 0.1
+    assert stale == cached
+    assert recovered.endswith("https://example.com/new")
+
+
+def test_timeouts_open_the_breaker_and_serve_stale():
+    """A host that stops answering in time should count as failing: stale copies are served, then calls fail fast"""
+    with jina_stand_in() as server:
+        main.fetcher = fetch.Fetcher(timeout=0.3, failure_threshold=3, reset_timeout=60)
+
+        async def run():
+            try:
+                cached = await main.scrape_web_async("https://example.com/cached")
+                next(iter(main.page_cache._entries.values()))['expires'] = time.time() - 1
+
+                server.RequestHandlerClass.delay = 1.0
+                stale = await main.scrape_web_async("https://example.com/cached")
+                errors = [await main.scrape_web_async(f"https://example.com/{i}") for i in range(2)]
+
+                start = time.perf_counter()
+                fast_error = await main.scrape_web_async("https://example.com/new")
+                return cached, stale, errors, fast_error, time.perf_counter() - start
+            finally:
+                await main.fetcher.aclose()
+        cached, stale, errors, fast_error, fast_seconds = asyncio.run(run())
+
+        breaker = main.fetcher.breaker("127.0.0.1")
+        assert breaker.state == "open"
+        assert breaker.failures == 3
+        assert main.page_cache.stats()['stale'] == 1
+
+    assert stale == cached
+    assert errors == [f"Error scraping https://example.com/{i}: timed out after 0.3s" for i in range(2)]
+    assert fast_error.startswith("Error scraping https://example.com/new: Circuit open for 127.0.0.1")
+    assert fast_seconds < 0.1
+
+
+def test_scrape_web_has_one_deadline():
+    """Retries should share one deadline, and both modes of scrape_web retry the same way"""
+    with jina_stand_in() as server:
+        main.fetcher = fetch.Fetcher(timeout=0.3)
+
+        async def run():
+            try:
+                start = time.perf_counter()
+                error = await main.scrape_web_async("https://example.com/slow")
+                seconds = time.perf_counter() - start
+
+                await main.fetcher.aclose()
+                main.fetcher = fetch.Fetcher()
+                handle = await main.scrape_web.fn("https://example.com/flaky", as_handle=True)
+                return error, seconds, handle
+            finally:
+                await main.fetcher.aclose()
+        error, seconds, handle = asyncio.run(run())
+        assert server.flaky_seen == 2
+
+    assert error == "Error scraping https://example.com/slow: timed out after 0.3s"
+    assert seconds < 0.5
+    assert handle['handle'].startswith(blobs.HANDLE_PREFIX)
+    assert main.blob_store.read(handle['handle']).endswith("https://example.com/flaky")
+
+def test_hedged_requests():
+    """A request slower than the host's usual latency should be hedged, and the faster copy win"""
+    with jina_stand_in(delay=0.01):
+        main.fetcher = fetch.Fetcher(hedge=True, hedge_min_delay=0.05)
+
+        async def run():
+            try:
+                for i in range(fetch.HEDGE_MIN_SAMPLES):
+                    await main.scrape_web_async(f"https://example.com/{i}")
+                start = time.perf_counter()
+                page = await main.scrape_web_async("https://example.com/spiky")
+                return page, time.perf_counter() - start
+            finally:
+                await main.fetcher.aclose()
+        page, seconds = asyncio.run(run())
+
+        assert page.endswith("https://example.com/spiky")
+        assert seconds < 0.5
+        assert main.fetcher.stats()['hedged'] == 1
+        assert main.fetcher.stats()['hedge_wins'] == 1
+
+
+def test_retry_delay_is_jittered():
+    """Backoff delays should be spread out between 0 and the exponential cap"""
+    delays = [fetch.retry_delay(httpx.ConnectError("down"), attempt=2, backoff=0.5) for _ in range(200)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 100
+    assert max(delays) > 1.5 and min(delays) < 0.5
+
+
+def test_scrape_errors_always_have_a_reason():
+    """httpx timeouts have an empty message, so the error should fall back to the exception name"""
+    assert main.scrape_error("https://example.com", httpx.ReadTimeout("")) == \
+        "Error scraping https://example.com: ReadTimeout"
+    assert main.scrape_error("https://example.com", httpx.ConnectError("refused")) == \
+        "Error scraping https://example.com: refused"
+
+def test_search_docs_tool():
+    """search_docs should load the shared index once and reuse it between calls"""
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = Path(tmp) / "fastmcp-main.zip"
+        write_zip(zip_path, CORPUS)
+        docs_index = main.docs_index
+        main.docs_index = search.SharedIndex(str(zip_path), str(Path(tmp) / "index"), download_url=None)
+        try:
+            result = call_tool("search_docs", {"query": "demo", "num_results": 2})
+            filenames = [doc['filename'] for doc in result.structured_content['result']]
+            assert filenames == ["examples/testing_demo/README.md", "docs/servers/tools.mdx"]
+
+            index = main.docs_index.get()
+            call_tool("search_docs", {"query": "context"})
+            assert main.docs_index.get() is index
+        finally:
+            main.docs_index = docs_index
+
+
+if __name__ == "__main__":
+    test_scrape_web_reuses_connections()
+    test_scrape_web_tool_runs_concurrently()
+    test_scrape_web_cache()
+    test_cancelling_one_caller_keeps_the_shared_fetch()
+    test_scrape_many_tool()
+    test_scrape_many_duplicate_urls()
+    test_large_pages_are_streamed_and_capped()
+    test_count_terms_in_text_tool()
+    test_analyze_page_tool()
+    test_content_handles()
+    test_blob_store_eviction()
+    test_server_metrics()
+    test_circuit_breaker_fails_fast_and_serves_stale()
+    test_timeouts_open_the_breaker_and_serve_stale()
+    test_scrape_web_has_one_deadline()
+    test_hedged_requests()
+    test_retry_delay_is_jittered()
+    test_scrape_errors_always_have_a_reason()
+    test_search_docs_tool()
+    print("All tool tests passed")
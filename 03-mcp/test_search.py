@@ -0,0 +1,411 @@
+"""Test script for the fastmcp docs search (runs offline against a small temporary corpus)"""
+
+import math
+import time
+import tempfile
+import zipfile
+from pathlib import Path
+
+import search
+from bm25 import BM25Index, tokenize
+from search import (
+    build_index,
+    build_index_streaming,
+    chunk_document,
+    diff_manifests,
+    filter_bitmap,
+    hash_source_tree,
+    iter_documents,
+    load_index,
+    load_manifest,
+    load_or_build_index,
+    process_files,
+    save_index,
+    scan_manifest,
+    search_docs,
+    search_many,
+    SharedIndex,
+)
+
+CORPUS = {
+    "README.md": "# FastMCP\n\nFastMCP is the fast way to build MCP servers.",
+    "docs/servers/context.mdx": "# Context\n\nThe context object gives tools access to logging and progress.",
+    "docs/servers/tools.mdx": "# Tools\n\nTools are functions the client can call. See the demo below.",
+    "examples/testing_demo/README.md": "# Testing demo\n\nA demo showing how to test a demo server.",
+}
+
+
+def write_corpus(root: Path, files: dict[str, str]):
+    """Write a dict of {relative path: content} under root"""
+    for filename, content in files.items():
+        path = root / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+
+def write_zip(zip_path: Path, files: dict[str, str], top_level: str = "fastmcp-main"):
+    """Write files into a zip archive under a single top-level directory, like GitHub archives"""
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for filename, content in files.items():
+            zip_ref.writestr(f"{top_level}/{filename}", content)
+        zip_ref.writestr(f"{top_level}/pyproject.toml", "[project]\nname = 'fastmcp'")
+
+
+def scores_by_filename(index, query: str) -> dict[str, float]:
+    """Score every document for query, keyed by filename"""
+    query_vec = index.vectorizers['content'].transform([query])
+    scores = (index.text_matrices['content'] @ query_vec.T).toarray().ravel()
+    return {doc['filename']: float(score) for doc, score in zip(index.docs, scores)}
+
+
+def assert_same_scores(actual: dict[str, float], expected: dict[str, float]):
+    """Both indexes should hold the same documents with (numerically) the same scores"""
+    assert sorted(actual) == sorted(expected)
+    for filename, score in expected.items():
+        assert math.isclose(actual[filename], score, abs_tol=1e-9), filename
+
+
+def test_snapshot_roundtrip():
+    """A loaded snapshot should return the same results as the freshly built index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "corpus"
+        snapshot_dir = str(Path(tmp) / "index")
+        write_corpus(root, CORPUS)
+
+        index = build_index(process_files(str(root)))
+        source_hash = hash_source_tree(str(root))
+        save_index(index, snapshot_dir, source_hash)
+
+        loaded = load_index(snapshot_dir, source_hash)
+        assert loaded is not None
+        # The matrix is backed by the read-only memory-mapped .npy files
+        assert not loaded.text_matrices['content'].data.flags.writeable
+
+        for query in ["demo", "context logging", "mcp servers"]:
+            expected = [doc['filename'] for doc in search_docs(index, query)]
+            actual = [doc['filename'] for doc in search_docs(loaded, query)]
+            assert actual == expected, query
+
+
+def test_snapshot_invalidated_on_change():
+    """Editing a file should change the source hash and trigger a rebuild"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "corpus"
+        snapshot_dir = str(Path(tmp) / "index")
+        write_corpus(root, CORPUS)
+
+        load_or_build_index(str(root), snapshot_dir)
+        old_hash = hash_source_tree(str(root))
+
+        write_corpus(root, {"docs/servers/tools.mdx": "# Tools\n\nNothing to see here."})
+        new_hash = hash_source_tree(str(root))
+        assert new_hash != old_hash
+        assert load_index(snapshot_dir, new_hash) is None
+
+        index = load_or_build_index(str(root), snapshot_dir)
+        results = search_docs(index, "demo")
+        assert "docs/servers/tools.mdx" not in [doc['filename'] for doc in results]
+        assert load_index(snapshot_dir, new_hash) is not None
+
+
+def test_manifest_diff():
+    """Only files whose content changed should show up in the diff"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_corpus(root, CORPUS)
+        old = scan_manifest(str(root))
+
+        write_corpus(root, {"README.md": "# FastMCP\n\nEdited.", "docs/new.md": "# New page"})
+        (root / "docs/servers/context.mdx").unlink()
+        new = scan_manifest(str(root), old)
+
+        added, changed, deleted = diff_manifests(old, new)
+        assert added == ["docs/new.md"]
+        assert changed == ["README.md"]
+        assert deleted == ["docs/servers/context.mdx"]
+
+
+def test_incremental_refresh_matches_rebuild():
+    """A refreshed snapshot should score documents exactly like a full rebuild, re-reading only changed files"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "corpus"
+        snapshot_dir = str(Path(tmp) / "index")
+        write_corpus(root, CORPUS)
+        load_or_build_index(str(root), snapshot_dir)
+
+        write_corpus(root, {
+            "docs/servers/tools.mdx": "# Tools\n\nTools are functions. Every tool has a schema.",
+            "docs/servers/prompts.mdx": "# Prompts\n\nPrompts are reusable demo templates for the client.",
+        })
+        (root / "README.md").unlink()
+
+        read = []
+        original_read_file = search._read_file
+
+        def tracking_read_file(file_path):
+            read.append(file_path.name)
+            return original_read_file(file_path)
+
+        search._read_file = tracking_read_file
+        try:
+            refreshed = load_or_build_index(str(root), snapshot_dir)
+        finally:
+            search._read_file = original_read_file
+
+        assert sorted(read) == ["prompts.mdx", "tools.mdx"]
+        assert sorted(load_manifest(snapshot_dir)) == sorted(scan_manifest(str(root)))
+
+        rebuilt = build_index(process_files(str(root)))
+        for query in ["demo", "tools schema", "client templates"]:
+            assert_same_scores(scores_by_filename(refreshed, query), scores_by_filename(rebuilt, query))
+
+        reloaded = load_index(snapshot_dir, hash_source_tree(str(root)))
+        assert [doc['filename'] for doc in reloaded.docs] == [doc['filename'] for doc in refreshed.docs]
+        assert reloaded.keyword_df['filename'].tolist() == [doc['filename'] for doc in refreshed.docs]
+
+
+def test_streaming_loader_matches_build_index():
+    """Batches from iter_documents should build an index equivalent to process_files + build_index"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        write_corpus(root, CORPUS)
+        write_corpus(root, {f"docs/extra/page{i}.md": f"# Page {i}\n\nExtra page number {i}." for i in range(10)})
+        (root / "docs/broken.md").write_bytes(b"\xff\xfe not utf-8")
+
+        timings = {}
+        batches = list(iter_documents(str(root), batch_size=4, max_workers=2, timings=timings))
+        assert all(len(batch) <= 4 for batch in batches)
+        assert set(timings) == {'walk', 'read', 'decode'}
+
+        streamed = build_index_streaming(batches, timings)
+        assert 'index' in timings
+        assert len(streamed.docs) == len(CORPUS) + 10
+
+        rebuilt = build_index(process_files(str(root)))
+        for query in ["demo", "extra page", "context logging"]:
+            assert_same_scores(scores_by_filename(streamed, query), scores_by_filename(rebuilt, query))
+
+
+def test_index_from_zip_matches_extracted_tree():
+    """Indexing the archive in place should give the same documents and scores as the extracted tree"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "corpus"
+        zip_path = Path(tmp) / "fastmcp-main.zip"
+        write_corpus(root, CORPUS)
+        write_zip(zip_path, CORPUS)
+
+        from_zip = load_or_build_index(str(zip_path), str(Path(tmp) / "zip-index"))
+        from_dir = build_index(process_files(str(root)))
+
+        assert sorted(doc['filename'] for doc in from_zip.docs) == sorted(CORPUS)
+        for query in ["demo", "context logging"]:
+            assert_same_scores(scores_by_filename(from_zip, query), scores_by_filename(from_dir, query))
+
+
+def test_zip_snapshot_refresh():
+    """A new archive should only re-read the members whose CRC changed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = Path(tmp) / "fastmcp-main.zip"
+        snapshot_dir = str(Path(tmp) / "index")
+        write_zip(zip_path, CORPUS)
+        load_or_build_index(str(zip_path), snapshot_dir)
+        assert load_index(snapshot_dir, hash_source_tree(str(zip_path))) is not None
+
+        write_zip(zip_path, {**CORPUS, "README.md": "# FastMCP\n\nNow with a demo."})
+        manifest = scan_manifest(str(zip_path))
+        added, changed, deleted = diff_manifests(load_manifest(snapshot_dir), manifest)
+        assert (added, changed, deleted) == ([], ["README.md"], [])
+
+        index = load_or_build_index(str(zip_path), snapshot_dir)
+        assert "README.md" in [doc['filename'] for doc in search_docs(index, "demo")]
+
+
+def test_chunk_document():
+    """Passages should follow headings, overlap inside long sections and point back into the file"""
+    content = (
+        "# Title\n\nIntro.\n\n"
+        "## Install\n\n```bash\n# not a heading\npip install fastmcp\n```\n\n"
+        "## Usage\n\n" + ("Call the tool from the client. " * 10 + "\n\n") * 10
+    )
+    chunks = chunk_document({'content': content, 'filename': 'docs/usage.md'}, chunk_size=400, chunk_overlap=60)
+
+    assert [chunk['chunk'] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0]['heading'] == "Title"
+    assert "pip install fastmcp" in chunks[0]['content']
+    assert {chunk['heading'] for chunk in chunks[1:]} == {"Usage"}
+    for chunk in chunks:
+        assert chunk['filename'] == 'docs/usage.md'
+        assert len(chunk['content']) <= 400
+        assert content[chunk['start']:chunk['start'] + len(chunk['content'])] == chunk['content']
+    for prev, chunk in zip(chunks[1:], chunks[2:]):
+        assert chunk['start'] < prev['start'] + len(prev['content'])
+
+
+def test_search_docs_merges_passages():
+    """search_docs should return the best passage per file, never the same file twice"""
+    long_doc = "# Demo guide\n\n" + "".join(
+        f"## Step {i}\n\n" + "This step of the demo shows another feature. " * 8 + "\n\n" for i in range(10)
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "corpus"
+        write_corpus(root, {**CORPUS, "docs/demo-guide.md": long_doc})
+        index = load_or_build_index(str(root), str(Path(tmp) / "index"), chunk_size=500, chunk_overlap=50)
+
+        assert len(index.docs) > len(CORPUS) + 1
+        results = search_docs(index, "demo", num_results=3)
+        filenames = [doc['filename'] for doc in results]
+        assert len(filenames) == len(set(filenames)) == 3
+        guide = next(doc for doc in results if doc['filename'] == "docs/demo-guide.md")
+        assert guide['passages'] > 1
+        assert len(guide['content']) <= 500
+
+
+def test_shared_index_swaps_in_background():
+    """SharedIndex should keep serving the old index until a background reload swaps in the new one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        zip_path = Path(tmp) / "fastmcp-main.zip"
+        write_zip(zip_path, CORPUS)
+        shared = SharedIndex(str(zip_path), str(Path(tmp) / "index"), download_url=None, check_interval=0)
+
+        first = shared.get()
+        assert not shared.reload()
+        assert shared.get() is first
+
+        write_zip(zip_path, {**CORPUS, "docs/new.md": "# Brand new page about widgets"})
+        assert shared.get() is first
+
+        deadline = time.monotonic() + 10
+        while shared.get() is first and time.monotonic() < deadline:
+            time.sleep(0.05)
+        latest = shared.get()
+        assert latest is not first
+        assert [doc['filename'] for doc in search_docs(latest, "widgets")] == ["docs/new.md"]
+        assert "docs/new.md" not in [doc['filename'] for doc in first.docs]
+
+
+def reference_bm25(docs: list[dict], query: str, k1: float = 1.2, b: float = 0.75) -> dict[str, float]:
+    """Textbook BM25, scoring every document one by one"""
+    tokenized = [tokenize(doc['content']) for doc in docs]
+    avg_length = sum(len(tokens) for tokens in tokenized) / len(docs)
+    scores = {}
+    for doc, tokens in zip(docs, tokenized):
+        score = 0.0
+        for term in tokenize(query):
+            df = sum(term in other for other in tokenized)
+            tf = tokens.count(term)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avg_length))
+        scores[doc['filename']] = score
+    return scores
+
+
+def test_bm25_matches_reference():
+    """BM25Index should score only the matching documents, with the textbook BM25 scores"""
+    docs = [{'content': content, 'filename': filename} for filename, content in CORPUS.items()]
+    index = build_index(docs, engine="bm25")
+    assert isinstance(index, BM25Index)
+
+    for query in ["demo", "context logging", "demo server demo"]:
+        expected = {filename: score for filename, score in reference_bm25(docs, query).items() if score > 0}
+        doc_ids, scores = index.score(query)
+        actual = {docs[i]['filename']: float(score) for i, score in zip(doc_ids, scores)}
+        assert sorted(actual) == sorted(expected), query
+        for filename, score in expected.items():
+            assert math.isclose(actual[filename], score, rel_tol=1e-5), (query, filename)
+
+        ranked = sorted(expected, key=lambda filename: (-expected[filename], filename))
+        results = index.search(query, num_results=2)
+        assert [doc['filename'] for doc in results] == ranked[:2]
+
+
+def test_bm25_filters_and_top_k():
+    """Keyword filters and top-k selection should behave like minsearch.Index"""
+    docs = [
+        {'content': f"demo {'tool ' * i}", 'filename': f"docs/{'servers' if i % 2 else 'clients'}/page{i}.md"}
+        for i in range(1, 30)
+    ]
+    index = BM25Index(text_fields=['content'], keyword_fields=['filename']).fit(docs)
+
+    results = index.search("tool", num_results=5, output_ids=True)
+    assert [doc['_id'] for doc in results] == [28, 27, 26, 25, 24]
+
+    results = index.search("tool", filter_dict={'filename': "docs/clients/page4.md"})
+    assert [doc['filename'] for doc in results] == ["docs/clients/page4.md"]
+    assert index.search("nothing matches this") == []
+
+
+def test_search_many_matches_search_docs():
+    """Batched queries should return exactly what search_docs returns one query at a time"""
+    long_doc = "# Demo guide\n\n" + "".join(
+        f"## Step {i}\n\n" + "Demo " * (i + 1) + " ".join(f"step{i}word{j}" for j in range(30)) + "\n\n" for i in range(8)
+    )
+    docs = [{'content': content, 'filename': filename} for filename, content in {**CORPUS, "docs/guide.md": long_doc}.items()]
+    passages = [chunk for doc in docs for chunk in chunk_document(doc, chunk_size=300, chunk_overlap=30)]
+    queries = ["demo", "context logging", "mcp servers", "no such words", "demo step tools"]
+
+    for engine in ("tfidf", "bm25"):
+        index = build_index(passages, engine=engine)
+        batched = search_many(index, queries, num_results=3)
+        assert len(batched) == len(queries)
+        for query, results in zip(queries, batched):
+            expected = search_docs(index, query, num_results=3)
+            assert [doc['filename'] for doc in results] == [doc['filename'] for doc in expected], (engine, query)
+            assert [doc['chunk'] for doc in results] == [doc['chunk'] for doc in expected], (engine, query)
+
+
+def test_search_docs_filters():
+    """Filename filters should narrow the candidates before scoring, for both engines"""
+    docs = [{'content': content, 'filename': filename} for filename, content in CORPUS.items()]
+    docs.append({'content': "# Servers\n\nA demo server page.", 'filename': "docs/servers.md"})
+
+    for engine in ("tfidf", "bm25"):
+        index = build_index(docs, engine=engine)
+        assert filter_bitmap(index) is None
+        assert filter_bitmap(index, prefix="docs/servers/").tolist() == [False, True, True, False, False]
+
+        filenames = lambda **filters: sorted(doc['filename'] for doc in search_docs(index, "demo", **filters))
+        assert filenames() == ["docs/servers.md", "docs/servers/tools.mdx", "examples/testing_demo/README.md"]
+        assert filenames(prefix="docs/servers/") == ["docs/servers/tools.mdx"]
+        assert filenames(extension="md") == ["docs/servers.md", "examples/testing_demo/README.md"]
+        assert filenames(extension=[".MDX", ".md"]) == filenames()
+        assert filenames(filename="docs/servers.md") == ["docs/servers.md"]
+        assert filenames(prefix="docs/", extension=".md") == ["docs/servers.md"]
+        assert filenames(prefix="nowhere/") == []
+
+        # Scores of the filtered candidates are the same as in an unfiltered search
+        everything = search_docs(index, "demo", num_results=10)
+        assert search_docs(index, "demo", prefix="examples/") == [
+            doc for doc in everything if doc['filename'].startswith("examples/")
+        ]
+
+
+def test_relevance_regression():
+    """Both engines should keep finding the source file of known-item queries (see bench_search.py)"""
+    from bench_search import evaluate_recall, load_corpus, make_labelled_queries
+
+    passages = load_corpus(None, num_docs=200)
+    labelled = make_labelled_queries(passages, num_queries=100)
+    for engine in ("tfidf", "bm25"):
+        index = build_index(passages, engine=engine)
+        metrics = evaluate_recall(index, labelled, num_results=5)
+        assert metrics['recall@5'] >= 0.9, (engine, metrics)
+        assert metrics['recall@1'] <= metrics['recall@5']
+
+
+if __name__ == "__main__":
+    test_snapshot_roundtrip()
+    test_snapshot_invalidated_on_change()
+    test_manifest_diff()
+    test_incremental_refresh_matches_rebuild()
+    test_streaming_loader_matches_build_index()
+    test_index_from_zip_matches_extracted_tree()
+    test_zip_snapshot_refresh()
+    test_chunk_document()
+    test_search_docs_merges_passages()
+    test_shared_index_swaps_in_background()
+    test_bm25_matches_reference()
+    test_bm25_filters_and_top_k()
+    test_search_many_matches_search_docs()
+    test_search_docs_filters()
+    test_relevance_regression()
+    print("All search tests passed")